@@ -0,0 +1,61 @@
+import os
+import numpy as np
+
+#Optional log of every electron reaching the collecting plate, for analysis
+#long after the KE tracker has scrolled past them. Records are buffered in a
+#fixed-size numpy chunk and written out whole, so memory stays bounded however
+#long the app runs. A chunk is also written once it holds `interval` seconds (sim
+#time) of arrivals, so a crash at low intensity doesn't lose minutes of them.
+#read_arrivals memory-maps the file rather than loading it.
+#t is simulation time (s), ke in eV, y the emission height in scene units, and
+#wavelength (nm), intensity (%) and wf (eV) the settings the electron was emitted under.
+arrival = np.dtype([('t', 'f8'), ('ke', 'f4'), ('y', 'f4'),
+                    ('wavelength', 'f4'), ('intensity', 'f4'), ('wf', 'f4')])
+
+class ArrivalWriter:
+    def __init__(self, path, chunk=4096, interval=10.0):
+        self.path = path
+        self.file = open(path, 'ab')
+        self.buffer = np.zeros(chunk, dtype=arrival)
+        self.interval = interval
+        self.n = 0
+        self.written = 0
+
+    def write(self, t, ke, y, wavelength, intensity, wf):
+        ke = np.atleast_1d(ke)
+        y = np.atleast_1d(y)
+        start = 0
+        while start < len(ke):
+            take = min(len(ke)-start, len(self.buffer)-self.n)
+            rows = self.buffer[self.n:self.n+take]
+            rows['t'] = t
+            rows['ke'] = ke[start:start+take]
+            rows['y'] = y[start:start+take]
+            rows['wavelength'] = wavelength
+            rows['intensity'] = intensity
+            rows['wf'] = wf
+            self.n += take
+            start += take
+            if self.n == len(self.buffer):
+                self.flush()
+        #Called every step, arrivals or not, so a part-filled chunk still goes out on time
+        if self.n and t-self.buffer['t'][0] >= self.interval:
+            self.flush()
+
+    def flush(self):
+        self.buffer[:self.n].tofile(self.file)
+        self.file.flush()
+        self.written += self.n
+        self.n = 0
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+def read_arrivals(path):
+    #Memory-mapped view of every complete record in the file (read only)
+    n = os.path.getsize(path)//arrival.itemsize
+    if n == 0:
+        return np.zeros(0, dtype=arrival)
+    return np.memmap(path, dtype=arrival, mode='r', shape=(n,))
@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+#Offscreen benchmarks for the animation, charts and slider pipeline.
+#Results are written as JSON so runs from two versions can be compared:
+#   python bench.py -o new.json --compare old.json
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+from PySide6.QtGui import QImage, QPainter
+from PySide6.QtWidgets import QApplication
+import main
+
+def timed(func, repeat=50, setup=None):
+    times = []
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter()-start)
+    return stats(times)
+
+def stats(times):
+    times = np.array(times)*1e3
+    return {'mean_ms': float(times.mean()), 'median_ms': float(np.median(times)),
+            'min_ms': float(times.min()), 'repeat': len(times)}
+
+def new_wave():
+    wave = main.Wave()
+    wave.show()
+    wave.graph._scene.timer.stop()
+    return wave
+
+def render_scene(scene, image):
+    painter = QPainter(image)
+    scene.render(painter)
+    painter.end()
+
+def bench_animation_tick(counts):
+    results = {}
+    for n in counts:
+        wave = new_wave()
+        scene = wave.graph._scene
+        #Steady population - everything respawns on arrival
+        scene.sim.electrons.add_many(np.random.uniform(15, 385, n), np.random.uniform(100, 250, n),
+                                 np.random.uniform(1.5, 2, n), 2)
+        image = QImage(420, 420, QImage.Format_ARGB32_Premultiplied)
+        def tick():
+            scene.tick(1)
+            render_scene(scene, image)
+        results[str(n)] = timed(tick, repeat=100)
+        wave.close()
+    return results
+
+def bench_ke_tracker(histories):
+    results = {}
+    for n in histories:
+        tracker = main.KE_Oscillo(window=300)
+        #Charts are built on first show, so fix the size rather than rely on size hints
+        tracker.resize(800, 600)
+        tracker.show()
+        #Fill the history quickly, then time ten arrivals per tick
+        for i in range(n//100):
+            tracker.add_arrivals(np.random.uniform(0, 10, 100))
+            tracker.adv()
+        def adv():
+            tracker.add_arrivals(np.random.uniform(0, 10, 10))
+            tracker.adv()
+        results[str(n)] = timed(adv, repeat=100)
+        tracker.close()
+    return results
+
+def bench_chart_2d():
+    chart = main.Chart_2D("Wavelength", "KE")
+    chart.resize(800, 600)
+    chart.show()
+    wavelengths = np.arange(100, 610, 10)
+    def fill():
+        chart.set_points(wavelengths, wavelengths, np.random.uniform(0, 10, len(wavelengths)))
+    #Overlay of 100 saved runs
+    runs = np.tile(wavelengths, 100), np.random.uniform(0, 10, 100*len(wavelengths))
+    return {'blank_setup': timed(chart.blank_setup, setup=fill),
+            'set_overlay_100_runs': timed(lambda: chart.set_overlay(*runs))}
+
+def bench_slider_sweep(app):
+    wave = new_wave()
+    wave.slideri.setValue(50)
+    def sweep():
+        for value in range(100, 601):
+            wave.slider.setValue(value)
+            app.processEvents()
+        #Let coalesced updates land before the clock stops
+        wave.updates.flush()
+        app.processEvents()
+    def start():
+        wave.slider.setValue(100)
+        wave.updates.flush()
+        app.processEvents()
+    result = timed(sweep, repeat=5, setup=start)
+    wave.close()
+    return result
+
+#Each startup run is a fresh interpreter, which prints how long its own part took
+#(and skips interpreter teardown, where Qt objects can crash on the way out)
+startup_scripts = {
+    'import_physics': "import physics",
+    'first_frame': "import sys, main\n"
+                   "from PySide6.QtWidgets import QApplication\n"
+                   "app = QApplication(sys.argv)\n"
+                   "wave = main.Wave()\n"
+                   "wave.show()\n"
+                   "app.processEvents()",
+}
+
+def bench_startup(repeat=5):
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for name, script in startup_scripts.items():
+        inner, total = [], []
+        code = f"import time\nstart = time.perf_counter()\n{script}\nprint(time.perf_counter()-start, flush=True)\nimport os\nos._exit(0)"
+        for i in range(repeat):
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                 cwd=here, check=True).stdout
+            total.append(time.perf_counter()-start)
+            inner.append(float(out.split()[-1]))
+        #total includes starting the interpreter itself
+        results[name] = {'in_process': stats(inner), 'total': stats(total)}
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return None
+
+def flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        if 'median_ms' in value:
+            flat[prefix+key] = value['median_ms']
+        else:
+            flat.update(flatten(value, prefix+key+'/'))
+    return flat
+
+def compare(new, old, tolerance):
+    #Prints median ratios and returns the benchmarks that got slower than tolerance allows
+    new_flat = flatten(new['results'])
+    old_flat = flatten(old['results'])
+    slower = []
+    for name in sorted(new_flat):
+        if name not in old_flat:
+            continue
+        ratio = new_flat[name]/old_flat[name]
+        flag = ''
+        if ratio > tolerance:
+            flag = '  REGRESSION'
+            slower.append(name)
+        print(f"{name:40s} {old_flat[name]:10.3f} ms -> {new_flat[name]:10.3f} ms  x{ratio:.2f}{flag}")
+    return slower
+
+def main_bench(argv=None):
+    parser = argparse.ArgumentParser(description="Photoelectric app benchmarks")
+    parser.add_argument('-o', '--output', default='bench.json')
+    parser.add_argument('--compare', help="earlier results to compare against")
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help="flag benchmarks whose median is more than this many times slower")
+    parser.add_argument('--electrons', nargs='+', type=int, default=[50, 500, 2000, 5000])
+    parser.add_argument('--history', nargs='+', type=int, default=[1500, 10000, 50000])
+    args = parser.parse_args(argv)
+
+    #Same electrons and noise every run (see randomness.py), so runs compare fairly
+    os.environ.setdefault('PHOTOELEC_SEED', '0')
+    np.random.seed(0)
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    results = {
+        'startup': bench_startup(),
+        'animation_tick': bench_animation_tick(args.electrons),
+        'ke_tracker_adv': bench_ke_tracker(args.history),
+        'chart_2d': bench_chart_2d(),
+        'slider_sweep': bench_slider_sweep(app),
+    }
+    output = {'revision': git_revision(), 'python': platform.python_version(),
+              'platform': platform.platform(), 'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+    for name, value in flatten(results).items():
+        print(f"{name:40s} {value:10.3f} ms")
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        print(f"\nCompared with {old.get('revision')}:")
+        if compare(output, old, args.tolerance):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main_bench())
@@ -1,26 +1,49 @@
 import sys
+from collections import deque
 import numpy as np
-import scipy
-from PySide6.QtCore import QPointF, Qt
+from PySide6.QtCore import QPointF, Qt, QMargins
 from PySide6.QtGui import QPainter, QFont, QColor
-from PySide6.QtWidgets import QMainWindow, QApplication
-from PySide6.QtCharts import QChart, QChartView, QScatterSeries, QValueAxis, QLineSeries
+from PySide6.QtWidgets import QMainWindow, QApplication, QComboBox, QLabel, QCheckBox
 
-h=scipy.constants.h
-e=scipy.constants.e
-c=scipy.constants.c
-k=scipy.constants.k
+#QtCharts is the slowest part of PySide6 to load, so it is only imported when the
+#first chart is actually built (every build() calls qtcharts first)
+QChart = QChartView = QScatterSeries = QValueAxis = QLineSeries = QAreaSeries = None
+
+def qtcharts():
+    global QChart, QChartView, QScatterSeries, QValueAxis, QLineSeries, QAreaSeries
+    if QChart is None:
+        from PySide6.QtCharts import QChart, QChartView, QScatterSeries, QValueAxis, QLineSeries, QAreaSeries
 
 class Chart_2D(QMainWindow):
-    def __init__(self, x_variable, y_variable):
+    def __init__(self, x_variable, y_variable, colour=None):
         super().__init__()
 
+        self.x_variable=x_variable
+        self.y_variable=y_variable
+        self.colour=colour
+        #The chart itself is only built the first time the tab is shown (see showEvent) -
+        #until then points just go into the arrays
+        self.chart = None
+        self.blank_setup()
+        #Saved runs shown alongside, see set_overlay
+        self.overlay_x = np.zeros(0)
+        self.overlay_y = np.zeros(0)
+        #Optional theoretical curve over the whole range, see set_theory
+        self.theory_x = np.zeros(0)
+        self.theory_y = np.zeros(0)
+        self.show_theory = False
+
+    def showEvent(self, event):
+        if self.chart is None:
+            self.build()
+        super().showEvent(event)
+
+    def build(self):
+        qtcharts()
         self.series = QScatterSeries()
+        if self.colour is not None:
+            self.series.setColor(self.colour)
 
-        #Adding a single point to series
-        
-        self.blank_setup()
-        
         #for i, val in enumerate(phet_calc_wavelength):
         #    self.series.append(val, phet_calc_current[i])
 
@@ -28,20 +51,21 @@ class Chart_2D(QMainWindow):
         #however append seems to use this by default?
         #self.series.append(QPointF(11,1))
 
-        #setup a saved series for allowing retention of one wavelength or intensity vs current dataset
+        #setup a saved series for showing stored runs (any number, all in this one series)
         self.saved_series = QScatterSeries()
         self.saved_series.setMarkerShape(QScatterSeries.MarkerShapeTriangle)
         self.saved_series.setColor(QColor(255,127,0))
 
-
-        
-        self.x_variable=x_variable
-        self.y_variable=y_variable
-
         self.chart = QChart()
         self.chart.legend().hide()
         self.chart.addSeries(self.series)
         self.chart.addSeries(self.saved_series)
+
+        #expected curve for the current metal/intensity, drawn as a line under the points
+        self.theory_series = QLineSeries()
+        self.theory_series.setColor(QColor(128,128,128))
+        self.theory_series.setVisible(self.show_theory)
+        self.chart.addSeries(self.theory_series)
         #Default axes then adding own leads to overlap
         #self.chart.createDefaultAxes()
         #self.chart.setTitleFont(QFont("Arial",pointSize=16))
@@ -109,6 +133,7 @@ class Chart_2D(QMainWindow):
         self.series.attachAxis(self.axis_x)
         #make sure to attach axes to all series you want to plot
         self.saved_series.attachAxis(self.axis_x)
+        self.theory_series.attachAxis(self.axis_x)
 
         #Y-axis
         self.axis_y = QValueAxis()
@@ -123,28 +148,68 @@ class Chart_2D(QMainWindow):
         self.chart.addAxis(self.axis_y, Qt.AlignLeft)
         self.series.attachAxis(self.axis_y)
         self.saved_series.attachAxis(self.axis_y)
+        self.theory_series.attachAxis(self.axis_y)
 
         self._chart_view = QChartView(self.chart)
         #Pretty fuzzy if not anti-aliased!
         self._chart_view.setRenderHint(QPainter.RenderHint.Antialiasing)
 
         self.setCentralWidget(self._chart_view)
-
-    def save_series(self):
-        self.saved_series.replace(self.series.points())
-        for i, value in enumerate(self.series.points()):
-            if self.series.pointConfiguration(i)[self.series.PointConfiguration.Visibility] == False:
-                self.saved_series.setPointConfiguration(i, {self.series.PointConfiguration.Visibility:False})
-            else:
-                self.saved_series.setPointConfiguration(i, {self.series.PointConfiguration.Visibility:True})
-        self.series.clear()
-        self.blank_setup()
-
+        self.push()
+        self.push(saved=True)
+        self.push_theory()
+
+    #Points live in numpy arrays with one slot per 10 nm from 100 to 600 nm.
+    #Only visible slots are sent to Qt, in a single replace per change, rather than
+    #keeping 51 hidden points and configuring them one at a time.
+    def set_overlay(self, x, y):
+        #Every selected saved run at once - one replace however many there are
+        self.overlay_x = np.asarray(x, dtype=float)
+        self.overlay_y = np.asarray(y, dtype=float)
+        self.push(saved=True)
+
+    def set_theory(self, x, y):
+        #Whole curve in one replace; only sent to Qt while it's switched on
+        self.theory_x = np.asarray(x, dtype=float)
+        self.theory_y = np.asarray(y, dtype=float)
+        if self.show_theory:
+            self.push_theory()
+
+    def set_theory_visible(self, shown):
+        self.show_theory = shown
+        if self.chart is None:
+            return
+        if shown:
+            self.push_theory()
+        self.theory_series.setVisible(shown)
 
     def blank_setup(self):
-        for i, value in enumerate(np.linspace(100, 600, 51)):
-            self.series.append(value,0)
-            self.series.setPointConfiguration(i, {self.series.PointConfiguration.Visibility:False})
+        self.xs = np.linspace(100, 600, 51)
+        self.ys = np.zeros(51)
+        self.shown = np.zeros(51, dtype=bool)
+        self.push()
+
+    def set_points(self, wavelengths, x, y):
+        #wavelengths pick the slots (multiples of 10 nm); x is what gets plotted
+        slots = np.asarray(wavelengths, dtype=int)//10-10
+        self.xs[slots] = x
+        self.ys[slots] = y
+        self.shown[slots] = True
+        self.push()
+
+    def push(self, saved=False):
+        if self.chart is None:
+            return
+        if saved:
+            series, x, y = self.saved_series, self.overlay_x, self.overlay_y
+        else:
+            series, x, y = self.series, self.xs[self.shown], self.ys[self.shown]
+        series.replace([QPointF(a, b) for a, b in zip(x.tolist(), y.tolist())])
+
+    def push_theory(self):
+        if self.chart is None or not self.show_theory:
+            return
+        self.theory_series.replace([QPointF(a, b) for a, b in zip(self.theory_x.tolist(), self.theory_y.tolist())])
 
     #BORK NOTE - found in example this return function for widgets in other files from main
     #Still did not work
@@ -152,9 +217,30 @@ class Chart_2D(QMainWindow):
     #    return self.chart
 
 class Oscillo(QMainWindow):
-    def __init__(self):
+    def __init__(self, compact=False, build_on_show=True):
         super().__init__()
 
+        #Built on first show like Chart_2D; the latest trace is kept until then
+        self.chart = None
+        self.points = []
+        #compact drops the axis labels and margins, for the small one in the animation
+        self.compact = compact
+        #Inside a scene the widget counts as shown as soon as it's added, whether or not
+        #any view is - so the animation's one is built by its view instead (see AnimationView)
+        self.build_on_show = build_on_show
+
+    def showEvent(self, event):
+        if self.build_on_show and self.chart is None:
+            self.build()
+        super().showEvent(event)
+
+    def set_points(self, points):
+        self.points = points
+        if self.chart is not None:
+            self.series.replace(points)
+
+    def build(self):
+        qtcharts()
         self.series = QLineSeries()
         self.series.setColor(QColor(255,127,0))
         
@@ -215,23 +301,124 @@ class Oscillo(QMainWindow):
         self._chart_view.setRenderHint(QPainter.RenderHint.Antialiasing)
 
         self.setCentralWidget(self._chart_view)
+        self.series.replace(self.points)
+
+        if self.compact:
+            self.axis_x.setTitleText(None)
+            self.axis_x.setLabelsVisible(False)
+            self.axis_y.setTitleText(None)
+            self.axis_y.setLabelsVisible(False)
+            self.chart.setMargins(QMargins(0,0,0,0))
+            self.chart.setBackgroundRoundness(0)
 
 class KE_Oscillo(QMainWindow):
-    def __init__(self):
+    def __init__(self, window=10, capacity=100000):
         super().__init__()
 
-        self.series = QScatterSeries()
-        self.series.setColor(QColor(255,127,0))
-        
+        #Arrival times and energies are kept in a fixed-size ring buffer. New arrivals
+        #are plotted at the current time and the x axis scrolls along with it, so old
+        #points never need rewriting.
+        self.history_windows = [10, 30, 60, 120, 300]
+        #Seconds of history shown (not self.window, which would hide QWidget.window())
+        self.window_s = window
+        self.now = 0.0
+        self.times = np.zeros(capacity)
+        self.energies = np.zeros(capacity)
+        self.head = 0
+        self.n = 0
+        #On screen the history is split into scatter series of segment_size points.
+        #Only the newest (self.series) changes, with one replace per tick - appending to
+        #or growing a big QScatterSeries costs a relayout of every marker in it.
+        #Whole segments are dropped once all their points have scrolled out of view.
+        #Each segment is [series, point count, newest arrival time]
+        self.segment_size = 256
+        self.segments = deque()
+        self.points = []
+        self.shown = 0
+        self.changed = False
+        #The chart is built the first time the tab is shown. While hidden or showing the
+        #histogram (live False) only the ring buffer is kept up to date, and the segments
+        #are redrawn from it when the scatter comes back.
+        self.chart = None
+        self.on_screen = False
+        self.live = False
+
+        #Histogram mode - every arrival is counted into fixed KE bins, optionally decaying
+        #with decay_time (s) so it follows the current settings. Drawing it costs the
+        #same however many electrons arrive.
+        self.bin_edges = np.linspace(0, 10, 51)
+        self.counts = np.zeros(len(self.bin_edges)-1)
+        self.histogram = False
+        self.decay = False
+        self.decay_time = 5.0
+        self.hist_changed = False
+
+        #History window selection
+        self.window_box = QComboBox()
+        for seconds in self.history_windows:
+            self.window_box.addItem(f"{seconds} s", seconds)
+        self.window_box.setCurrentIndex(self.history_windows.index(self.window_s))
+        self.window_box.currentIndexChanged.connect(self.change_window)
+        toolbar = self.addToolBar("History")
+        toolbar.addWidget(QLabel("History window "))
+        toolbar.addWidget(self.window_box)
+
+        #Scatter/histogram switch
+        self.view_box = QComboBox()
+        self.view_box.addItems(["Scatter", "Histogram"])
+        self.view_box.currentIndexChanged.connect(self.change_view)
+        self.decay_box = QCheckBox("Decay")
+        self.decay_box.toggled.connect(self.change_decay)
+        toolbar.addWidget(QLabel("  View "))
+        toolbar.addWidget(self.view_box)
+        toolbar.addWidget(self.decay_box)
+
+    def showEvent(self, event):
+        if self.chart is None:
+            self.build()
+        self.on_screen = True
+        self.update_view()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.on_screen = False
+        self.update_view()
+        super().hideEvent(event)
+
+    def change_view(self):
+        self.histogram = self.view_box.currentIndex() == 1
+        self.update_view()
+
+    def change_decay(self, checked):
+        self.decay = checked
+
+    def update_view(self):
+        #Keeps the scatter segments only while the scatter is actually on screen
+        live = self.on_screen and not self.histogram
+        if live and not self.live:
+            self.live = True
+            self.redraw()
+        elif self.live and not live:
+            self.live = False
+            self.clear_segments()
+        if self.chart is None:
+            return
+        chart = self.hist_chart if self.histogram else self.chart
+        if self._chart_view.chart() is not chart:
+            self._chart_view.setChart(chart)
+        if self.histogram and self.on_screen:
+            self.draw_histogram()
+
+    def build(self):
+        qtcharts()
         self.chart = QChart()
         self.chart.legend().hide()
-        self.chart.addSeries(self.series)
 
         #Variable setting
-        self.x_min=0
-        self.x_max=10
-        self.x_interval=0.5
-        self.x_title="Time"
+        self.x_min=self.now-self.window_s
+        self.x_max=self.now
+        self.x_interval=self.window_s/20
+        self.x_title="Time (s)"
 
         self.y_min=0
         self.y_max=10
@@ -253,7 +440,6 @@ class KE_Oscillo(QMainWindow):
         #labels font affects both axis title and tick labels
         #self.axis_x.setLabelsFont(font)
         self.chart.addAxis(self.axis_x, Qt.AlignBottom)
-        self.series.attachAxis(self.axis_x)
 
         #Y-axis
         self.axis_y = QValueAxis()
@@ -266,32 +452,166 @@ class KE_Oscillo(QMainWindow):
         self.axis_y.setTitleText(self.y_title)
         #self.axis_y.setLabelsFont(font)
         self.chart.addAxis(self.axis_y, Qt.AlignLeft)
-        self.series.attachAxis(self.axis_y)
 
-        #x_range = np.linspace(-1e-2, 1e-2, 2001)
-        #omega = 2*np.pi*3000
-        #self.series.clear
-        #for x in x_range:
-        #    y=0.5*np.exp(complex(0, omega*x)).real
-        #    self.series.append(x, y)
+        #Histogram is a filled step outline - an area under a line series of bin edges
+        self.hist_chart = QChart()
+        self.hist_chart.legend().hide()
+        self.hist_upper = QLineSeries()
+        self.hist_series = QAreaSeries(self.hist_upper)
+        self.hist_series.setColor(QColor(255,127,0))
+        self.hist_series.setBorderColor(QColor(255,127,0))
+        self.hist_chart.addSeries(self.hist_series)
+        self.hist_axis_x = QValueAxis()
+        self.hist_axis_x.setRange(self.bin_edges[0], self.bin_edges[-1])
+        self.hist_axis_x.setTickType(QValueAxis.TicksDynamic)
+        self.hist_axis_x.setTickInterval(1)
+        self.hist_axis_x.setTitleText("Kinetic energy (eV)")
+        self.hist_chart.addAxis(self.hist_axis_x, Qt.AlignBottom)
+        self.hist_series.attachAxis(self.hist_axis_x)
+        self.hist_axis_y = QValueAxis()
+        self.hist_axis_y.setRange(0, 1)
+        self.hist_axis_y.setLabelFormat("%.0f")
+        self.hist_axis_y.setTitleText("Arrivals")
+        self.hist_chart.addAxis(self.hist_axis_y, Qt.AlignLeft)
+        self.hist_series.attachAxis(self.hist_axis_y)
 
         self._chart_view = QChartView(self.chart)
         #Pretty fuzzy if not anti-aliased!
         self._chart_view.setRenderHint(QPainter.RenderHint.Antialiasing)
 
         self.setCentralWidget(self._chart_view)
-    def adv(self):
-        curr_points = self.series.pointsVector()
-        #This function is very useful - KE tracker really chugs once >4000 or so
-        #keeping between 500 and 1000 definitely means can keep going for longer without slowing too much
-        #1000 is too few if at max intensity though - chops off at about 3 seconds, so extended to 1500
-        #crash 27/08 - removePoints not removeMultiple
-        if len(curr_points)>1500:
-            self.series.removePoints(0, 500)
-        curr_points = self.series.pointsVector()
-        shift_points = [QPointF(point.x()-0.01, point.y()) for point in curr_points]
-        self.series.replace(shift_points)
 
+    def draw_histogram(self):
+        x = np.repeat(self.bin_edges, 2)[1:-1]
+        y = np.repeat(self.counts, 2)
+        self.hist_upper.replace([QPointF(a, b) for a, b in zip(x.tolist(), y.tolist())])
+        self.hist_axis_y.setRange(0, max(self.counts.max()*1.1, 1))
+        self.hist_changed = False
+
+    def change_window(self):
+        self.window_s = self.window_box.currentData()
+        if self.chart is not None:
+            self.axis_x.setTickInterval(self.window_s/20)
+            self.axis_x.setRange(self.now-self.window_s, self.now)
+
+    def new_segment(self):
+        self.series = QScatterSeries()
+        self.series.setColor(QColor(255,127,0))
+        self.chart.addSeries(self.series)
+        #make sure to attach axes to all series you want to plot
+        self.series.attachAxis(self.axis_x)
+        self.series.attachAxis(self.axis_y)
+        self.segments.append([self.series, 0, self.now])
+        self.points = []
+
+    def drop_segment(self):
+        #Removes the oldest segment from the chart
+        series, count, newest = self.segments.popleft()
+        if not self.segments:
+            self.new_segment()
+        self.chart.removeSeries(series)
+        series.deleteLater()
+        self.shown -= count
+
+    def clear_segments(self):
+        while self.segments:
+            series, count, newest = self.segments.popleft()
+            self.chart.removeSeries(series)
+            series.deleteLater()
+        self.points = []
+        self.shown = 0
+        self.changed = False
+
+    def redraw(self):
+        #Rebuilds every segment from the ring buffer, oldest first
+        self.clear_segments()
+        idx = (self.head + np.arange(self.n)) % len(self.times)
+        times = self.times[idx].tolist()
+        energies = self.energies[idx].tolist()
+        for start in range(0, max(self.n, 1), self.segment_size):
+            self.new_segment()
+            self.points = [QPointF(t, ke) for t, ke in zip(times[start:start+self.segment_size],
+                                                             energies[start:start+self.segment_size])]
+            if self.points:
+                self.series.replace(self.points)
+                self.segments[-1][1] = len(self.points)
+                self.segments[-1][2] = self.points[-1].x()
+        self.shown = self.n
+        self.axis_x.setTickInterval(self.window_s/20)
+        self.axis_x.setRange(self.now-self.window_s, self.now)
+
+    def count(self):
+        return self.n
+
+    def add_arrivals(self, energies, t=None):
+        #Arrivals are stamped with t, or the tracker's current time
+        if t is None:
+            t = self.now
+        energies = np.atleast_1d(energies)[-len(self.times):]
+        m = len(energies)
+        if m == 0:
+            return
+        capacity = len(self.times)
+        #Full buffer - forget the oldest arrivals
+        excess = self.n + m - capacity
+        if excess > 0:
+            self.head = (self.head + excess) % capacity
+            self.n -= excess
+        idx = (self.head + self.n + np.arange(m)) % capacity
+        self.times[idx] = t
+        self.energies[idx] = energies
+        self.n += m
+        width = self.bin_edges[1]-self.bin_edges[0]
+        bins = np.clip(((energies-self.bin_edges[0])/width).astype(int), 0, len(self.counts)-1)
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+        self.hist_changed = True
+        if not self.live:
+            return
+        #...and on screen, whole segments of them from the old end
+        while self.shown + m > capacity:
+            self.drop_segment()
+        for ke in energies.tolist():
+            if len(self.points) == self.segment_size:
+                #Segment full - it never changes again
+                self.series.replace(self.points)
+                self.new_segment()
+            self.points.append(QPointF(t, ke))
+            self.segments[-1][1] += 1
+        self.segments[-1][2] = t
+        self.shown += m
+        self.changed = True
+
+    def trim(self, cutoff):
+        #Forgets arrivals older than cutoff - times are in order round the ring
+        if self.n == 0 or self.times[self.head] >= cutoff:
+            return
+        capacity = len(self.times)
+        end = self.head + self.n
+        old = int(np.searchsorted(self.times[self.head:min(end, capacity)], cutoff))
+        if end > capacity and old == capacity - self.head:
+            old += int(np.searchsorted(self.times[:end-capacity], cutoff))
+        self.head = (self.head + old) % capacity
+        self.n -= old
+
+    def adv(self, dt=0.01):
+        #Scroll by moving the axis rather than shifting every point - per tick cost
+        #no longer grows with history (it really chugged once >4000 points)
+        self.now += dt
+        cutoff = self.now - self.window_s
+        self.trim(cutoff)
+        if self.decay:
+            self.counts *= np.exp(-dt/self.decay_time)
+            self.hist_changed = True
+        if self.histogram and self.on_screen and self.hist_changed:
+            self.draw_histogram()
+        if not self.live:
+            return
+        while self.segments[0][1] and self.segments[0][2] < cutoff:
+            self.drop_segment()
+        if self.changed:
+            self.series.replace(self.points)
+            self.changed = False
+        self.axis_x.setRange(cutoff, self.now)
 
 #Standalone app for testing
 #if __name__ == "__main__":
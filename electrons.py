@@ -0,0 +1,146 @@
+import numpy as np
+
+#Structure-of-arrays store for the photoelectrons in the animation.
+#Each electron is a slot in a set of parallel numpy arrays rather than its
+#own QGraphicsItem, so a whole frame is stepped with a few array operations.
+#Kept free of Qt so the same model can be stepped headless.
+
+class ElectronArray:
+    def __init__(self, capacity=64, size=5):
+        self.size = size
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.base_speed = np.zeros(capacity)
+        #KE each electron was emitted with (eV) - speed can be floored for display, this isn't
+        self.ke = np.zeros(capacity)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.regen = np.zeros(capacity, dtype=bool)
+        #Stack of free slot indices - electrons that hit the plate hand their slot back
+        #so respawning reuses slots instead of creating anything
+        self.free = np.arange(capacity-1, -1, -1)
+        self.n_free = capacity
+        #Live count kept up to date on add/remove, so population checks are O(1)
+        self.n_alive = 0
+
+    def capacity(self):
+        return len(self.alive)
+
+    def grow(self):
+        #Double every array - amortised so adding stays cheap
+        extra = self.capacity()
+        for name in ('x', 'y', 'speed', 'base_speed', 'ke', 'alive', 'regen'):
+            arr = getattr(self, name)
+            setattr(self, name, np.concatenate([arr, np.zeros(extra, dtype=arr.dtype)]))
+        free = np.empty(2*extra, dtype=self.free.dtype)
+        free[:self.n_free] = self.free[:self.n_free]
+        free[self.n_free:self.n_free+extra] = np.arange(2*extra-1, extra-1, -1)
+        self.free = free
+        self.n_free += extra
+
+    def take_slots(self, n):
+        while self.n_free < n:
+            self.grow()
+        self.n_free -= n
+        return self.free[self.n_free:self.n_free+n][::-1].copy()
+
+    def add(self, x, y, speed, base_speed, ke=None):
+        return self.add_many(x, y, speed, base_speed, ke)[0]
+
+    def add_many(self, x, y, speed, base_speed, ke=None):
+        #Arguments may be scalars or arrays; the number of electrons comes from the longest.
+        #ke defaults to speed**2
+        if ke is None:
+            ke = np.square(speed)
+        n = max(np.size(x), np.size(y), np.size(speed), np.size(base_speed), np.size(ke))
+        idx = self.take_slots(n)
+        self.x[idx] = x
+        self.y[idx] = y
+        self.speed[idx] = speed
+        self.base_speed[idx] = base_speed
+        self.ke[idx] = ke
+        self.alive[idx] = True
+        self.regen[idx] = True
+        self.n_alive += n
+        return idx
+
+    def count(self):
+        return self.n_alive
+
+    def positions(self):
+        return self.x[self.alive], self.y[self.alive]
+
+    def step(self):
+        #Moves every live electron across by its speed in one go
+        self.x[self.alive] += self.speed[self.alive]
+
+    def arrive(self, plate_x):
+        #Removes and returns the indices of live electrons whose leading edge has reached
+        #plate_x - they only ever move in +x between the plates, so that's the whole test
+        idx = np.flatnonzero(self.alive & (self.x + self.size >= plate_x))
+        self.remove(idx)
+        return idx
+
+    def remove(self, idx):
+        self.alive[idx] = False
+        self.free[self.n_free:self.n_free+len(idx)] = idx
+        self.n_free += len(idx)
+        self.n_alive -= len(idx)
+
+    def clear(self):
+        #Removes every electron at once
+        self.alive[:] = False
+        self.free = np.arange(self.capacity()-1, -1, -1)
+        self.n_free = self.capacity()
+        self.n_alive = 0
+
+    def regen_switch(self):
+        #None of the electrons currently out will respawn
+        self.regen[:] = False
+
+class RespawnQueue:
+    #Pending respawns, drained once per tick by whoever owns the clock.
+    #Every entry gets the same delay so due times arrive already sorted and a
+    #ring buffer does the job of a heap - pushing and popping allocate nothing per electron
+    def __init__(self, capacity=64):
+        self.due = np.zeros(capacity)
+        self.base_speed = np.zeros(capacity)
+        self.head = 0
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def grow(self):
+        order = (self.head + np.arange(self.n)) % len(self.due)
+        for name in ('due', 'base_speed'):
+            arr = getattr(self, name)
+            new = np.zeros(2*len(arr))
+            new[:self.n] = arr[order]
+            setattr(self, name, new)
+        self.head = 0
+
+    def push(self, due, base_speed):
+        base_speed = np.atleast_1d(base_speed)
+        m = len(base_speed)
+        if m == 0:
+            return
+        while self.n + m > len(self.due):
+            self.grow()
+        idx = (self.head + self.n + np.arange(m)) % len(self.due)
+        self.due[idx] = due
+        self.base_speed[idx] = base_speed
+        self.n += m
+
+    def pop_due(self, now):
+        #Returns the base speeds of every respawn due at or before now
+        idx = (self.head + np.arange(self.n)) % len(self.due)
+        ready = int(np.count_nonzero(self.due[idx] <= now))
+        out = self.base_speed[idx[:ready]]
+        self.head = (self.head + ready) % len(self.due)
+        self.n -= ready
+        return out
+
+    def clear(self):
+        self.head = 0
+        self.n = 0
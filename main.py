@@ -1,28 +1,60 @@
 import numpy as np
+import os
 import sys
-import scipy
-import random
 import time
-from functools import partial
-from PySide6.QtCore import QObject, Qt, Slot, QRectF, QTimer, QPointF, QMargins
-from PySide6.QtGui import (QBrush, QColor, QPainter, QPen, QPainterPath, QRadialGradient, QGradient, 
-                           QFont)
+import shiboken6
+from functools import lru_cache
+from PySide6.QtCore import QObject, Qt, Slot, QRectF, QTimer, QPointF, QEvent
+from PySide6.QtGui import (QColor, QPainter, QPen, QPainterPath, QRadialGradient, QGradient, 
+                           QFont, QPolygonF)
 from PySide6.QtWidgets import (QApplication, QSlider, QWidget, QGridLayout, QSpinBox, QLabel, QDoubleSpinBox, 
 QVBoxLayout, QPushButton, QTabWidget, QComboBox, QGraphicsView, QGraphicsItem, QGraphicsScene, 
-QGraphicsProxyWidget, QGraphicsSimpleTextItem)
+QGraphicsProxyWidget, QGraphicsSimpleTextItem, QListWidget, QListWidgetItem, QCheckBox)
 from chart import Chart_2D, Oscillo, KE_Oscillo
+import physics
+from simulation import SimClock, Simulation
+from randomness import RandomService, seed_from_env
+from session import SessionRecorder
+from worker import WorkerSim
+from scheduler import FrameScheduler
+from profiling import TickProfiler
+from runstore import RunStore
+from arrivals import ArrivalWriter
 #from animation_pane import Electron, Plate, MainAnimationPane
 
-h=scipy.constants.h
-e=scipy.constants.e
-c=scipy.constants.c
-k=scipy.constants.k
+#Lamp/beam colour for every slider wavelength, worked out once
+beam_colours = [QColor(*rgb) for rgb in (physics.wavelength_rgb(np.arange(100, 601))*255).astype(int).tolist()]
+
+def beam_colour(wavelength):
+    return beam_colours[int(wavelength)-100]
+
+#Waveforms are memoized by slider values so scrubbing back over them costs nothing
+@lru_cache(maxsize=512)
+def oscillo_points(wavelength, intensity):
+    x, y = physics.oscillo_trace(wavelength, intensity)
+    return [QPointF(px, py) for px, py in zip(x.tolist(), y.tolist())]
 
 class Wave(QWidget):
     def __init__(self, parent=None):
         super(Wave, self).__init__(parent)
         self.setWindowTitle("Wavelength")
 
+        #Cheap readouts (boxes, KE, current) update straight away on every slider step;
+        #charts, oscilloscope, colours and electron reset are marked dirty here and
+        #redrawn once per frame so a fast drag doesn't queue hundreds of recomputations
+        self.updates = FrameScheduler(parent=self)
+        self.updates.add_job('colour', self.change_colour, 0)
+        self.updates.add_job('charts', self.plot_pending, 1)
+        self.updates.add_job('theory', self.update_theory, 1)
+        self.updates.add_job('oscillo', self.update_oscillo, 2)
+        self.updates.add_job('elecs', self.reset_elecs, 3)
+        #All random numbers (electrons and current noise) come from here;
+        #set PHOTOELEC_SEED to an integer to make a session repeatable
+        self.random = RandomService(seed_from_env())
+        #Wavelengths still waiting to be plotted, so every multiple of 10 crossed gets a point
+        self.pending_ke = set()
+        self.pending_current = set()
+
         #Create slider widget
         self.slider= QSlider(Qt.Orientation.Horizontal)
         self.slider.setMinimum(100)
@@ -34,12 +66,7 @@ class Wave(QWidget):
         self.slider.valueChanged.connect(self.slider_to_box)
         self.slider.valueChanged.connect(self.slider_to_ke)
         
-        #Only update chart at slider's final position
-        #Note this does not yet update when box value is changed instead!
-        #Box only has signals for when text/value changed - ie would be triggered
-        #whenever slider changes too given above reciprocal updates.
-        self.slider.valueChanged.connect(self.ke_to_chart)
-        self.slider.valueChanged.connect(self.reset_elecs)
+        self.slider.valueChanged.connect(self.queue_slider_updates)
         
         #Merged current plotting into current calculation slot - no risk of overplotting
         #self.slider.valueChanged.connect(self.current_to_chart)
@@ -62,8 +89,7 @@ class Wave(QWidget):
         self.slideri.setSingleStep(1)
         #remember the connect when sending the signal!
         self.slideri.valueChanged.connect(self.slideri_to_boxi)
-        self.slideri.valueChanged.connect(self.slideri_to_oscillo)
-        self.slideri.valueChanged.connect(self.reset_elecs)
+        self.slideri.valueChanged.connect(self.queue_intensity_updates)
 
         #Intensity box
         intensity_label = QLabel("Intensity (% of Max Power)")
@@ -76,30 +102,44 @@ class Wave(QWidget):
         self.slideri.sliderPressed.connect(self.wipe_intensity)
         #self.slideri.valueChanged.connect(self.slider_to_current)
         
-        self.powerdict = {'sodium':5.159120066772471e-14, 'zinc':5.4195652077219776e-14, 'calcium':5.246463359088317e-14,
-        'copper':4.393591405908849e-14, 'platinum':3.697302254000795e-14}
-        self.wfdict = {'sodium': 2.35, 'calcium':2.80, 'copper': 4.40, 'zinc': 4.24, 'platinum':5.9}
-        self.wf = self.wfdict['sodium']
-        self.optpower = self.powerdict['sodium']
+        #Metals come from the materials file; KE and current are looked up in each
+        #metal's precomputed response surface (see physics.response_surface)
+        self.powerdict = physics.powerdict
+        self.wfdict = physics.wfdict
+        self.metal = next(iter(self.wfdict))
+        self.wf = self.wfdict[self.metal]
+        self.optpower = self.powerdict[self.metal]
 
         #Combobox for selecting metal target
         target_label = QLabel("Target metal")
         self.target = QComboBox()
         self.target.insertItems(0, list(self.wfdict.keys()))
         self.target.currentIndexChanged.connect(self.change_target)
-        self.target.currentIndexChanged.connect(self.reset_elecs)
+
+        #Theory curve toggle - overlays the expected KE/current over the whole range
+        self.theory = QCheckBox("Theory curve")
+        self.theory.toggled.connect(self.toggle_theory)
 
         #Try importing Scatter graph
         #self.graph = MainGraph()
-        self.graph = MainGraph(self.slideri.value())
-
-        self.slider.valueChanged.connect(self.graph._scene.beam.change_colour)
-        self.slider.valueChanged.connect(self.graph._scene.lamp.change_colour)
+        #PHOTOELEC_DENSITY multiplies the electron population cap and spawn rate
+        #(1 gives at most ~50 on screen); raise it for thousands
+        elec_density = int(os.environ.get('PHOTOELEC_DENSITY') or 1)
+        self.graph = MainGraph(self.slideri.value(), rng=self.random.spawn, elec_density=elec_density)
 
         #Save button
         self.save_button = QPushButton("Save dataset")
         self.save_button.clicked.connect(self.main_save_series)
 
+        #Saved datasets - ticked ones are overlaid on the KE/current charts.
+        #PHOTOELEC_RUNS names a file to keep them in between sessions
+        self.runs = RunStore(os.environ.get('PHOTOELEC_RUNS'))
+        self.runs_list = QListWidget()
+        self.runs_list.setMaximumHeight(80)
+        for run in self.runs.runs():
+            self.add_run_item(run, checked=False)
+        self.runs_list.itemChanged.connect(self.show_runs)
+
         #Kinetic Energy box
         ke_label = QLabel("Kinetic energy (eV)")
         self.ke = QDoubleSpinBox()
@@ -117,7 +157,6 @@ class Wave(QWidget):
 
         #First time, these need to be here to have all widgets defined?
         self.slider.valueChanged.connect(self.slider_to_current)
-        self.slider.valueChanged.connect(self.slider_to_oscillo)
         self.slideri.valueChanged.connect(self.slider_to_current)
         self.slideri.valueChanged.connect(self.slider_to_ke)
 
@@ -134,13 +173,16 @@ class Wave(QWidget):
         gridlayout.addWidget(self.save_button, 2, 2)
         #gridlayout.addWidget(curr_label, 1, 3)
         #gridlayout.addWidget(self.curr, 0, 3)
+        gridlayout.addWidget(self.theory, 0, 3)
         gridlayout.addWidget(target_label, 1, 3)
         gridlayout.addWidget(self.target, 2, 3)
+        gridlayout.addWidget(self.runs_list, 0, 4, 3, 1)
         #Space stretches twice as much if window is expanded
         gridlayout.setColumnStretch(0,1)
         gridlayout.setColumnStretch(1,1)
         gridlayout.setColumnStretch(2,1)
         gridlayout.setColumnStretch(3,1)
+        gridlayout.setColumnStretch(4,1)
         #self.setLayout(layout)
 
         #Set overall layout
@@ -150,6 +192,12 @@ class Wave(QWidget):
         layout.addWidget(self.graph)
         self.setLayout(layout)
 
+    def changeEvent(self, event):
+        #Minimising doesn't always hide child widgets, so check again here
+        if event.type() == QEvent.WindowStateChange:
+            self.graph.update_running()
+        super().changeEvent(event)
+
         #Updates box value if slider changed
     def slider_to_box(self):
         self.spinbox.setValue(self.slider.value())
@@ -165,119 +213,140 @@ class Wave(QWidget):
     def boxi_to_slideri(self):
         self.slideri.setValue(self.intensity.value())
 
+    def queue_slider_updates(self):
+        #Only plot multiples of 10 nm to avoid overcrowding
+        if self.slider.value() % 10 == 0:
+            self.pending_ke.add(self.slider.value())
+            self.pending_current.add(self.slider.value())
+        self.updates.mark('colour', 'charts', 'oscillo', 'elecs')
+
+    def queue_intensity_updates(self):
+        if self.slider.value() % 10 == 0:
+            self.pending_current.add(self.slider.value())
+        self.updates.mark('charts', 'theory', 'oscillo', 'elecs')
+
+    def plot_pending(self):
+        #All wavelengths passed since the last frame go to each chart in one go
+        if self.pending_ke:
+            self.ke_to_chart(np.array(sorted(self.pending_ke)))
+        if self.pending_current:
+            self.current_to_chart(np.array(sorted(self.pending_current)))
+        self.pending_ke.clear()
+        self.pending_current.clear()
+
+    def change_colour(self):
+        self.graph._scene.beam.change_colour(self.slider.value())
+        self.graph._scene.lamp.change_colour(self.slider.value())
+
     def change_target(self):
         new_target = self.target.currentText()
+        self.metal = new_target
         self.wf = self.wfdict[new_target]
         self.optpower = self.powerdict[new_target]
-        self.graph._chart1.series.clear()
-        self.graph._chart1.blank_setup()
-        self.graph._chart2.series.clear()
-        self.graph._chart2.blank_setup()
-        self.graph._chart3.series.clear()
-        self.graph._chart3.blank_setup()
-        self.graph._chart4.series.clear()
-        self.graph._chart4.blank_setup()
+        self.pending_ke.clear()
+        self.pending_current.clear()
+        #Electrons from the old metal go straight away rather than finishing their trip
+        self.graph._scene.sim.clear()
+        self.updates.mark('elecs', 'theory')
+        for chart in self.graph.plots():
+            chart.blank_setup()
 
     def slider_to_ke(self):
-        ke=(h*c/(self.slider.value()*1e-9))-self.wf*e
-        if ke < 0:
-            ke=0
-        ke_elec=ke/e
-        if self.slideri.value()==0:
-            ke_elec=0
-        self.ke.setValue(ke_elec)
+        self.ke.setValue(float(physics.lookup(self.metal, self.slider.value(), self.slideri.value())[0]))
     
-    def ke_to_chart(self):
-        #Only plot multiples of 10 nm to avoid overcrowding
-        if self.slider.value() % 10 == 0.0:
-            #Keeping non-replace versions for security
-            #Colour change unnecessary, but keeping it in for demonstration
-            #self.graph._chart1.series.append(self.slider.value(), self.ke.value())
-            self.graph._chart1.series.replace(float(self.slider.value()), float(0), float(self.slider.value()), self.ke.value())
-            self.graph._chart1.series.setPointConfiguration(self.slider.value()/10-10, {self.graph._chart1.series.PointConfiguration.Visibility:True, 
-                                                                                        self.graph._chart1.series.PointConfiguration.Color:QColor(0, 191, 255)})
-            #self.graph._chart2.series.append(c/(self.slider.value()*1e-9*1e12), self.ke.value())
-            self.graph._chart2.series.replace(float(self.slider.value()), float(0), float(c/(self.slider.value()*1e-9*1e12)), self.ke.value())
-            self.graph._chart2.series.setPointConfiguration(self.slider.value()/10-10, {self.graph._chart1.series.PointConfiguration.Visibility:True})
+    def ke_to_chart(self, wavelength):
+        #wavelength can be a single value or an array of multiples of 10 nm
+        ke = physics.lookup(self.metal, wavelength, self.slideri.value())[0]
+        #Keeping non-replace versions for security
+        #self.graph._chart1.series.append(wavelength, ke)
+        self.graph._chart1.set_points(wavelength, wavelength, ke)
+        #self.graph._chart2.series.append(physics.frequency_thz(wavelength), ke)
+        self.graph._chart2.set_points(wavelength, physics.frequency_thz(wavelength), ke)
 
     def slider_to_current(self):
-        si_wave = self.slider.value()*1e-9
-        ke_norm=((-h*c/si_wave)+self.wf*e)
-        #Linear (power), F-D and thermal factor
-        I = self.optpower*(self.slideri.value()/100)*si_wave/(h*c)*e*(1/(np.exp(ke_norm/(k*300))+1))*((h*c/si_wave-self.wf*e)/k*300)**2
-        #Crude cutoff to get inversion - essentially if F-D and thermal factors 'equal 1', switch to linear
-        if 10.93*(self.slideri.value()/100)*si_wave/(h*c)*e < I:
-            I = 10.93*(self.slideri.value()/100)*si_wave/(h*c)*e
+        I = float(physics.lookup(self.metal, self.slider.value(), self.slideri.value())[1])
         self.curr.setValue(I)
+
+    def current_to_chart(self, wavelength):
         # Still only plots if a multiple of 10nm - problem if they change intensity at a non-multiple
         # Wouldn't matter so much if implement the deletion of previous data - perhaps on intensity slider pressed??
-        if self.slider.value() % 10 == 0.0:
-            rng = np.random.default_rng()
-            noise=rng.normal(loc=0.0, scale=0.01)
-            I_noise = I+noise
-            self.graph._chart3.series.replace(float(self.slider.value()), float(0), float(self.slider.value()), I_noise)
-            self.graph._chart3.series.setPointConfiguration(self.slider.value()/10-10, {self.graph._chart3.series.PointConfiguration.Visibility:True, 
-                                                                                        self.graph._chart3.series.PointConfiguration.Color:QColor(0, 191, 255)})
-            self.graph._chart4.series.replace(float(self.slider.value()), float(0), float(c/(self.slider.value()*1e3)), I_noise)
-            self.graph._chart4.series.setPointConfiguration(self.slider.value()/10-10, {self.graph._chart3.series.PointConfiguration.Visibility:True, 
-                                                                                        self.graph._chart3.series.PointConfiguration.Color:QColor(0, 191, 255)})
-            #Original append version
-            #self.graph._chart3.series.append(si_wave*1e9, I_noise)
-            #self.graph._chart4.series.append(c/(si_wave*1e12), I_noise)
-    
-    def slider_to_oscillo(self):
-        if self.slider.value() % 10 == 0:
-            x_range = np.linspace(-2e-3, 2e-3, 401)
-            freq_thz = c/(self.slider.value()*1e3)
-            omega = 2*np.pi*freq_thz
-            self.graph._chart5.series.clear()
-            #Osc in graphics scene
-            self.graph._scene.osc.series.clear()
-            for x in x_range:
-                y=(self.slideri.value()/100)*np.exp(complex(0, omega*x)).real
-                self.graph._chart5.series.append(x, y)
-                self.graph._scene.osc.series.append(x,y)
-
-    def slideri_to_oscillo(self):
-        if self.slideri.value() % 5 == 0:
-            x_range = np.linspace(-2e-3, 2e-3, 401)
-            freq_thz = c/(self.slider.value()*1e3)
-            omega = 2*np.pi*freq_thz
-            self.graph._chart5.series.clear()
-            #Osc in graphics scene
-            self.graph._scene.osc.series.clear()
-            for x in x_range:
-                y=(self.slideri.value()/100)*np.exp(complex(0, omega*x)).real
-                self.graph._chart5.series.append(x, y)
-                self.graph._scene.osc.series.append(x,y)
-
+        I = physics.lookup(self.metal, wavelength, self.slideri.value())[1]
+        noise=self.random.noise.normal(loc=0.0, scale=0.01, size=np.shape(I))
+        I_noise = I+noise
+        self.graph._chart3.set_points(wavelength, wavelength, I_noise)
+        self.graph._chart4.set_points(wavelength, physics.frequency_thz(wavelength), I_noise)
+        #Original append version
+        #self.graph._chart3.series.append(wavelength, I_noise)
+        #self.graph._chart4.series.append(physics.frequency_thz(wavelength), I_noise)
+
+    def toggle_theory(self, checked):
+        #Curve is worked out before showing so it only goes to Qt once
+        self.update_theory()
+        for chart in self.graph.plots():
+            chart.set_theory_visible(checked)
+
+    def update_theory(self):
+        #Every nm at once from the metal's response surface, one replace per chart
+        if not self.theory.isChecked():
+            return
+        wavelength = physics.surface_wavelengths
+        ke, I = physics.lookup(self.metal, wavelength, self.slideri.value())
+        frequency = physics.frequency_thz(wavelength)
+        self.graph._chart1.set_theory(wavelength, ke)
+        self.graph._chart2.set_theory(frequency, ke)
+        self.graph._chart3.set_theory(wavelength, I)
+        self.graph._chart4.set_theory(frequency, I)
+
+    def update_oscillo(self):
+        points = oscillo_points(self.slider.value(), self.slideri.value())
+        self.graph._chart5.set_points(points)
+        #Osc in graphics scene
+        self.graph._scene.osc.set_points(points)
 
     def wipe_intensity(self):
-        self.graph._chart1.series.clear()
-        self.graph._chart1.blank_setup()
-        self.graph._chart2.series.clear()
-        self.graph._chart2.blank_setup()
-        self.graph._chart3.series.clear()
-        self.graph._chart3.blank_setup()
-        self.graph._chart4.series.clear()
-        self.graph._chart4.blank_setup()
+        self.pending_ke.clear()
+        self.pending_current.clear()
+        for chart in self.graph.plots():
+            chart.blank_setup()
 
     def main_save_series(self):
-        self.graph._chart1.save_series()
-        self.graph._chart2.save_series()
-        self.graph._chart3.save_series()
-        self.graph._chart4.save_series()
+        #Stores what's on the wavelength plots as a new run, shows it and clears the plots
+        ke_chart, current_chart = self.graph._chart1, self.graph._chart3
+        plotted = ke_chart.shown | current_chart.shown
+        if not plotted.any():
+            return
+        self.runs.add_run(ke_chart.xs[plotted],
+                                np.where(ke_chart.shown, ke_chart.ys, np.nan)[plotted],
+                                np.where(current_chart.shown, current_chart.ys, np.nan)[plotted],
+                                self.target.currentText(), self.slideri.value())
+        self.add_run_item(self.runs.runs()[-1], checked=True)
+        for chart in self.graph.plots():
+            chart.blank_setup()
+
+    def add_run_item(self, run, checked):
+        run_id, name, metal, intensity, timestamp = run
+        item = QListWidgetItem(f"{name}: {metal}, {intensity:g}%")
+        item.setData(Qt.UserRole, run_id)
+        item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+        self.runs_list.addItem(item)
+        #Once the list is connected, this fires itemChanged, which redraws the overlays
+        item.setCheckState(Qt.Checked if checked else Qt.Unchecked)
+
+    def show_runs(self):
+        #Overlays every ticked run, one replace per chart
+        items = [self.runs_list.item(i) for i in range(self.runs_list.count())]
+        rows = self.runs.select([item.data(Qt.UserRole) for item in items if item.checkState() == Qt.Checked])
+        ke = ~np.isnan(rows['ke'])
+        current = ~np.isnan(rows['current'])
+        self.graph._chart1.set_overlay(rows['wavelength'][ke], rows['ke'][ke])
+        self.graph._chart2.set_overlay(rows['frequency'][ke], rows['ke'][ke])
+        self.graph._chart3.set_overlay(rows['wavelength'][current], rows['current'][current])
+        self.graph._chart4.set_overlay(rows['frequency'][current], rows['current'][current])
 
     def reset_elecs(self):
-        #print(self.graph._scene.items())
-        for i in self.graph._scene.items():
-            i.regen_switch()
-        max_ke=(h*c/(self.slider.value()*1e-9))-self.wf*e
-        if max_ke < 0:
-            max_ke=0
-        max_ke_elec=max_ke/e
-        if self.slideri.value()==0:
-            max_ke_elec=0
+        #Electrons already out finish their trip but aren't respawned
+        self.graph._scene.sim.regen_switch()
+        max_ke_elec=float(physics.lookup(self.metal, self.slider.value(), self.slideri.value())[0])
         #Avoid too many electrons at once
         
         #if len(self.graph._scene.items()) < 100:
@@ -290,12 +359,7 @@ class Wave(QWidget):
         #    wait_timer.start(1000)
 
         #Scaling factor of number of photoelectrons based off constant power output
-        #For all surfaces, this linear scaling only occurs up to 200 nm after which scattering dominates
-        si_wave = self.slider.value()
-        if si_wave < 200:
-            ph_scale = si_wave/200
-        else:
-            ph_scale = 1
+        ph_scale = float(physics.photon_scale(self.slider.value()))
 
         #making this a permanent attribute in case also want
         #to introduce distribution/scattering at high wavelength later
@@ -303,7 +367,8 @@ class Wave(QWidget):
         #Have instead moved the sparsity of electrons control to the init_elec function
         #Set max speed to just sqrt of KE - mass factor effectively cancels with the scaling factor
         #necessary to actually see the electron movement on a sensible timescale!
-        self.graph._scene.init_elec(self.slideri.value(), np.sqrt(max_ke_elec), np.sqrt(max_ke_elec), ph_scale)
+        self.graph._scene.init_elec(self.slideri.value(), np.sqrt(max_ke_elec), np.sqrt(max_ke_elec), ph_scale,
+                                    self.slider.value(), self.wf)
 
     def current_to_graphic_current(self):
         self.graph._scene.curr.setValue(self.curr.value())
@@ -311,21 +376,22 @@ class Wave(QWidget):
         
 
 class MainGraph(QTabWidget):
-    def __init__(self, intensity, p=None):
+    def __init__(self, intensity, p=None, rng=None, elec_density=1):
         super().__init__(p)
 
         #screen_size = self.screen.size()
         #minimum_graph_size = QSize(screen_size.width()/2, screen_size.height()/1.75)
 
-        self._chart1 = Chart_2D("Wavelength", "KE")
+        #Colour on the wavelength plots unnecessary, but keeping it in for demonstration
+        self._chart1 = Chart_2D("Wavelength", "KE", colour=QColor(0, 191, 255))
         self._chart2 = Chart_2D("Frequency", "KE")
-        self._chart3 = Chart_2D("Wavelength", "Current")
-        self._chart4 = Chart_2D("Frequency", "Current")
+        self._chart3 = Chart_2D("Wavelength", "Current", colour=QColor(0, 191, 255))
+        self._chart4 = Chart_2D("Frequency", "Current", colour=QColor(0, 191, 255))
         self._chart5 = Oscillo()
-        self._scene = MainAnimationPane(intensity)
-        self._tab6 = QGraphicsView(self._scene)
-        self._tab6.show()
         self._chart6 = KE_Oscillo()
+        #The scene feeds arrivals straight to the KE tracker
+        self._scene = MainAnimationPane(intensity, elec_density=elec_density, rng=rng, tracker=self._chart6)
+        self._tab6 = AnimationView(self._scene)
 
         self.addTab(self._chart1, "Wavelength vs Kinetic Energy")
         self.addTab(self._chart2, "Frequency vs Kinetic Energy")
@@ -334,37 +400,78 @@ class MainGraph(QTabWidget):
         self.addTab(self._chart5, "Oscilloscope")
         self.addTab(self._tab6, "Animation")
         self.addTab(self._chart6, "Kinetic energy tracker")
+        #Charts build themselves the first time their tab is shown
+        self.currentChanged.connect(self.update_running)
+
+    def update_running(self):
+        #The electrons (and the KE tracker they feed) only move while one of those two
+        #tabs is on screen - switching to a static chart or minimising pauses them
+        shown = self.isVisible() and not self.window().isMinimized()
+        if shown and self.currentWidget() in (self._tab6, self._chart6):
+            self._scene.resume()
+        else:
+            self._scene.pause()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_running()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.update_running()
+
+    def plots(self):
+        #The four KE/current plots, which are wiped and saved together
+        return (self._chart1, self._chart2, self._chart3, self._chart4)
+
+class AnimationView(QGraphicsView):
+    #Builds the scene's oscilloscope the first time the tab is seen, like the chart tabs
+    def showEvent(self, event):
+        osc = self.scene().osc
+        if osc.chart is None:
+            osc.build()
+        super().showEvent(event)
+
+    #Only here so the scene's profiler, when on, can time the whole repaint
+    def paintEvent(self, event):
+        profiler = self.scene().profiler
+        if profiler is None:
+            return super().paintEvent(event)
+        start = profiler.start()
+        super().paintEvent(event)
+        profiler.stop('paint', start)
+
 ####
 #### Moved all animation related classes here - otherwise destroy elec method
 #### does not find plate as MainAnimationPane was defined in this script
+#The apparatus never moves, so each part is drawn once into a pixmap cache which
+#the view reuses every frame (update() invalidates it, e.g. on a colour change).
+#Paths and gradients are built up front rather than on every paint. The cache is
+#clipped to boundingRect, so those now cover the pen as well as the path.
 class Plate(QGraphicsItem):
     def __init__(self):
         super().__init__()
 
         self.color = QColor(0,0,0) 
+        self.pen = QPen(self.color, 10)
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
 
     def boundingRect(self):
-        return QRectF(0, 0, 15, 150)
+        return QRectF(0, -5, 15, 160)
     
     def paint(self, painter, option, widget):
         painter.setRenderHint(QPainter.Antialiasing)
 
-        painter.setPen(QPen(self.color, 10))
+        painter.setPen(self.pen)
         painter.drawLine(5, 0, 5, 150)
-    #Dummy function to make it easier to code wavelength/intensity update functions
-    def regen_switch(self):
-        return None
     
 class Lamp(QGraphicsItem):
     def __init__(self):
         super().__init__()
         self.color = QColor(0.5*255,0.5*255,0.5*255)
         self.setRotation(-45)
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
 
-    def boundingRect(self):
-        return QRectF(0, 0, 100, 70)
-    
-    def paint(self,painter,option,widget):
         lamp_path = QPainterPath()
         lamp_path.moveTo(100, 20)
         lamp_path.lineTo(60, 20)
@@ -395,50 +502,29 @@ class Lamp(QGraphicsItem):
         bulb_path.moveTo(30, 70)
         bulb_path.quadTo(50, 35, 30, 0)
         bulb_path.quadTo(15, 35, 30, 70)
+        self.lamp_path = lamp_path
+        self.bulb_path = bulb_path
+        #make pen self.color for cool glow!
+        self.pen = QPen(QColor(0,0,0), 2)
 
+    def boundingRect(self):
+        return self.lamp_path.boundingRect().adjusted(-1, -1, 1, 1)
+    
+    def paint(self,painter,option,widget):
         painter.setRenderHint(QPainter.Antialiasing)
-        #make pen self.color for cool glow!
-        painter.setPen(QPen(QColor(0,0,0), 2))
-        painter.drawPath(lamp_path)
-        painter.fillPath(lamp_path, QColor(0,0,0))
-        painter.drawPath(bulb_path)
-        painter.fillPath(bulb_path, self.color)
-
-    def regen_switch(self):
-        return None
+        painter.setPen(self.pen)
+        painter.drawPath(self.lamp_path)
+        painter.fillPath(self.lamp_path, QColor(0,0,0))
+        painter.drawPath(self.bulb_path)
+        painter.fillPath(self.bulb_path, self.color)
+
     
-    def change_colour(self):
-        beamcol = wave.slider.value()
-        #Values from stackoverflow 3407942, Dan Bruton
-        red = 0
-        green = 0
-        blue = 0
-        if beamcol < 350:
-            red = 0.5
-            green = 0.5
-            blue = 0.5
-        elif beamcol >= 350 and beamcol < 380:
-            red = (beamcol - 350)/60 + 0.5
-            green = (380 - beamcol)/60
-            blue = (beamcol - 350)/60 + 0.5
-        elif beamcol >= 380 and beamcol < 440:
-            red = (440 - beamcol)/60
-            blue = 1
-        elif beamcol >= 440 and beamcol < 490:
-            green = (beamcol - 440)/50
-            blue = 1
-        elif beamcol >= 490 and beamcol < 510:
-            green = 1
-            blue = (510-beamcol)/20
-        elif beamcol >= 510 and beamcol < 580:
-            red = (beamcol - 510)/70
-            green = 1
-        elif beamcol >=580 and beamcol < 645:
-            red = 1
-            green = (645-beamcol)/65
-        elif beamcol >=645 and beamcol <=780:
-            red = 1
-        self.color = QColor(red*255, green*255, blue*255)
+    def change_colour(self, wavelength):
+        #Redrawing throws the cached pixmap away, so only when the colour really changes
+        color = beam_colour(wavelength)
+        if color == self.color:
+            return
+        self.color = color
         self.update()
 
 class Beam(QGraphicsItem):
@@ -448,64 +534,39 @@ class Beam(QGraphicsItem):
         #Setting rotation here is much better than rotating painter! 
         #rotates bounding box etc as well
         self.setRotation(-45)
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+
+        self.beam_path = QPainterPath()
+        self.beam_path.moveTo(70, 15)
+        self.beam_path.lineTo(70, 85)
+        self.beam_path.lineTo(0,100)
+        self.beam_path.lineTo(0,0)
+        self.beam_path.closeSubpath()
+        self.set_gradient()
+
+    def set_gradient(self):
+        self.linearGrad = QRadialGradient(70, 50, 70)
+        self.linearGrad.setColorAt(1, Qt.white)
+        self.linearGrad.setColorAt(0, self.color)
 
     def boundingRect(self):
         return QRectF(0, 0, 70, 100)
     
     def paint(self,painter,option,widget):
-        beam_path = QPainterPath()
-        beam_path.moveTo(70, 15)
-        beam_path.lineTo(70, 85)
-        beam_path.lineTo(0,100)
-        beam_path.lineTo(0,0)
-        beam_path.closeSubpath()
-
-        linearGrad = QRadialGradient(70, 50, 70)
-        linearGrad.setColorAt(1, Qt.white)
-        linearGrad.setColorAt(0, self.color)
-
         painter.setRenderHint(QPainter.Antialiasing)
         painter.setOpacity(0.5)
         painter.setPen(Qt.NoPen)
         #painter.rotate(-45)
-        painter.drawPath(beam_path)
-        painter.fillPath(beam_path, linearGrad)
+        painter.drawPath(self.beam_path)
+        painter.fillPath(self.beam_path, self.linearGrad)
 
-    def regen_switch(self):
-        return None
     
-    def change_colour(self):
-        beamcol = wave.slider.value()
-        #Values from stackoverflow 3407942, Dan Bruton
-        red = 0
-        green = 0
-        blue = 0
-        if beamcol < 350:
-            red = 0.5
-            green = 0.5
-            blue = 0.5
-        elif beamcol >= 350 and beamcol < 380:
-            red = (beamcol - 350)/60 + 0.5
-            green = (380 - beamcol)/60
-            blue = (beamcol - 350)/60 + 0.5
-        elif beamcol >= 380 and beamcol < 440:
-            red = (440 - beamcol)/60
-            blue = 1
-        elif beamcol >= 440 and beamcol < 490:
-            green = (beamcol - 440)/50
-            blue = 1
-        elif beamcol >= 490 and beamcol < 510:
-            green = 1
-            blue = (510-beamcol)/20
-        elif beamcol >= 510 and beamcol < 580:
-            red = (beamcol - 510)/70
-            green = 1
-        elif beamcol >=580 and beamcol < 645:
-            red = 1
-            green = (645-beamcol)/65
-        elif beamcol >=645 and beamcol <=780:
-            red = 1
-        self.color = QColor(red*255, green*255, blue*255)
+    def change_colour(self, wavelength):
+        color = beam_colour(wavelength)
+        if color == self.color:
+            return
+        self.color = color
+        self.set_gradient()
         self.update()
 
 class Wire1(QGraphicsItem):
@@ -513,122 +574,109 @@ class Wire1(QGraphicsItem):
         super().__init__()
 
         self.color = QColor(0,0,0) 
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+
+        self.wire1_path = QPainterPath()
+        self.wire1_path.moveTo(15, 150)
+        self.wire1_path.lineTo(0, 150)
+        self.wire1_path.lineTo(0, 350)
+        self.wire1_path.lineTo(150,350)
+        self.wire1_path.lineTo(150,347)
+        self.wire1_path.lineTo(3,347)
+        self.wire1_path.lineTo(3,153)
+        self.wire1_path.lineTo(15,153)
+        self.wire1_path.closeSubpath()
 
     def boundingRect(self):
-        return QRectF(0, 0, 250, 300)
+        return self.wire1_path.boundingRect().adjusted(-1, -1, 1, 1)
     
     def paint(self, painter, option, widget):
         painter.setRenderHint(QPainter.Antialiasing)
 
         painter.setPen(QPen(self.color, 1))
-
-        wire1_path = QPainterPath()
-        wire1_path.moveTo(15, 150)
-        wire1_path.lineTo(0, 150)
-        wire1_path.lineTo(0, 350)
-        wire1_path.lineTo(150,350)
-        wire1_path.lineTo(150,347)
-        wire1_path.lineTo(3,347)
-        wire1_path.lineTo(3,153)
-        wire1_path.lineTo(15,153)
-        wire1_path.closeSubpath()
-        painter.drawPath(wire1_path)
-        painter.fillPath(wire1_path, self.color)
-    #Dummy function to make it easier to code wavelength/intensity update functions
-    def regen_switch(self):
-        return None
+        painter.drawPath(self.wire1_path)
+        painter.fillPath(self.wire1_path, self.color)
     
 class Wire2(QGraphicsItem):
     def __init__(self):
         super().__init__()
 
         self.color = QColor(0,0,0) 
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+
+        self.wire2_path = QPainterPath()
+        self.wire2_path.moveTo(400, 150)
+        self.wire2_path.lineTo(415, 150)
+        self.wire2_path.lineTo(415, 350)
+        self.wire2_path.lineTo(250,350)
+        self.wire2_path.lineTo(250,347)
+        self.wire2_path.lineTo(412,347)
+        self.wire2_path.lineTo(412,153)
+        self.wire2_path.lineTo(400,153)
+        self.wire2_path.closeSubpath()
 
     def boundingRect(self):
-        return QRectF(0, 0, 250, 300)
+        return self.wire2_path.boundingRect().adjusted(-1, -1, 1, 1)
     
     def paint(self, painter, option, widget):
         painter.setRenderHint(QPainter.Antialiasing)
 
         painter.setPen(QPen(self.color, 1))
-
-        wire1_path = QPainterPath()
-        wire1_path.moveTo(400, 150)
-        wire1_path.lineTo(415, 150)
-        wire1_path.lineTo(415, 350)
-        wire1_path.lineTo(250,350)
-        wire1_path.lineTo(250,347)
-        wire1_path.lineTo(412,347)
-        wire1_path.lineTo(412,153)
-        wire1_path.lineTo(400,153)
-        wire1_path.closeSubpath()
-        painter.drawPath(wire1_path)
-        painter.fillPath(wire1_path, self.color)
-    #Dummy function to make it easier to code wavelength/intensity update functions
-    def regen_switch(self):
-        return None    
+        painter.drawPath(self.wire2_path)
+        painter.fillPath(self.wire2_path, self.color)
 
 class Wire3(QGraphicsItem):
     def __init__(self):
         super().__init__()
 
         self.color = QColor(0,0,0) 
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+
+        self.wire_path = QPainterPath()
+        self.wire_path.moveTo(0,0)
+        self.wire_path.quadTo(30, -30, 70, 30)
 
     def boundingRect(self):
-        return QRectF(0, 0, 70, 30)
+        return self.wire_path.boundingRect().adjusted(-3, -3, 3, 3)
     
     def paint(self, painter, option, widget):
-        wire_path = QPainterPath()
-        wire_path.moveTo(0,0)
-        wire_path.quadTo(30, -30, 70, 30)
         painter.setRenderHint(QPainter.Antialiasing)
 
         painter.setPen(QPen(self.color, 5))
-        painter.drawPath(wire_path)
+        painter.drawPath(self.wire_path)
         #painter.drawLine(0, 0, 100, 0)
-    #Dummy function to make it easier to code wavelength/intensity update functions
-    def regen_switch(self):
-        return None
-
-class Proxy(QGraphicsProxyWidget):
-    def __init__(self):
-        super().__init__()
-
-    def regen_switch(self):
-        return None
 
 class Instrument(QGraphicsItem):
     def __init__(self):
         super().__init__()
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+
+        self.beam_path = QPainterPath()
+        self.beam_path.moveTo(5, 0)
+        self.beam_path.lineTo(115, 0)
+        self.beam_path.quadTo(120, 0, 120, 5)
+        self.beam_path.lineTo(120,75)
+        self.beam_path.quadTo(120, 80, 115, 80)
+        self.beam_path.lineTo(5, 80)
+        self.beam_path.quadTo(0, 80, 0, 75)
+        self.beam_path.lineTo(0, 5)
+        self.beam_path.quadTo(0, 0, 5, 0)
+        self.beam_path.closeSubpath()
+
+        self.linearGrad = QRadialGradient(60, 40, 200)
+        self.linearGrad.setColorAt(0, QColor(0.5*255, 0.5*255, 0.5*255))
+        self.linearGrad.setColorAt(1, Qt.white)
 
     def boundingRect(self):
-        return QRectF(0, 0, 120, 80)
+        return QRectF(-1, -1, 122, 82)
     
     def paint(self,painter,option,widget):
-        beam_path = QPainterPath()
-        beam_path.moveTo(5, 0)
-        beam_path.lineTo(115, 0)
-        beam_path.quadTo(120, 0, 120, 5)
-        beam_path.lineTo(120,75)
-        beam_path.quadTo(120, 80, 115, 80)
-        beam_path.lineTo(5, 80)
-        beam_path.quadTo(0, 80, 0, 75)
-        beam_path.lineTo(0, 5)
-        beam_path.quadTo(0, 0, 5, 0)
-        beam_path.closeSubpath()
-
-        linearGrad = QRadialGradient(60, 40, 200)
-        linearGrad.setColorAt(0, QColor(0.5*255, 0.5*255, 0.5*255))
-        linearGrad.setColorAt(1, Qt.white)
-
         painter.setRenderHint(QPainter.Antialiasing)
         painter.setPen(QPen(Qt.black, 1))
         #painter.rotate(-45)
-        painter.drawPath(beam_path)
-        painter.fillPath(beam_path, linearGrad)
+        painter.drawPath(self.beam_path)
+        painter.fillPath(self.beam_path, self.linearGrad)
 
-    def regen_switch(self):
-        return None
     
 class Ammeter_text(QGraphicsSimpleTextItem):
     def __init__(self):
@@ -643,13 +691,18 @@ class Ammeter_text(QGraphicsSimpleTextItem):
     def centreAt(self,pos):
         self.setPos(pos - self.boundingRect().center())
 
-    def regen_switch(self):
-        return None
+class Profile_text(QGraphicsSimpleTextItem):
+    def __init__(self):
+        super().__init__()
 
+        self.setFont(QFont("Courier New", 7))
+        self.setBrush(QColor(120, 0, 0))
 
 class MainAnimationPane(QGraphicsScene):
-    def __init__(self, intensity):
+    def __init__(self, intensity, elec_density=1, rng=None, tracker=None):
         super().__init__()
+        #KE_Oscillo given each arrival, if any
+        self.tracker = tracker
 
         #self.scene=QGraphicsScene()
         self.setSceneRect(0, 0, 400, 400)
@@ -673,7 +726,7 @@ class MainAnimationPane(QGraphicsScene):
         self.curr.setReadOnly(True)
         #self.curr.setDecimals(3) 3rd decimal doesn't work properly?
         self.curr.setStyleSheet("font: 15pt Arial")
-        self.currproxy = Proxy()
+        self.currproxy = QGraphicsProxyWidget()
         self.currproxy.setWidget(self.curr)
         self.addItem(self.currproxy)
         self.curr_text = Ammeter_text()
@@ -681,7 +734,7 @@ class MainAnimationPane(QGraphicsScene):
         self.currproxy.setPos(150, 330)
         self.curr_text.setPos(155, 370)
 
-        self.osc = Oscillo()
+        self.osc = Oscillo(compact=True, build_on_show=False)
         #self.linearGrad = QRadialGradient(60, 40, 200)
         #self.linearGrad.setColorAt(0, QColor(0.5*255, 0.5*255, 0.5*255))
         #self.linearGrad.setColorAt(1, Qt.white)
@@ -691,19 +744,11 @@ class MainAnimationPane(QGraphicsScene):
         self.osc.setPalette(self.osc_palette)
         #self.osc.setStyleSheet("border-color:Qt.white")
         self.osc.resize(160,120)
-        self.osc.axis_x.setTitleText(None)
-        self.osc.axis_x.setLabelsVisible(False)
-        self.osc.axis_y.setTitleText(None)
-        self.osc.axis_y.setLabelsVisible(False)
-        self.osc.chart.setMargins(QMargins(0,0,0,0))
-        self.osc.chart.setBackgroundRoundness(0)
-        self.oscproxy = Proxy()
+        self.oscproxy = QGraphicsProxyWidget()
         self.oscproxy.setWidget(self.osc)
         self.addItem(self.oscproxy)
         self.oscproxy.setPos(300, -50)
 
-
-        self.regen_list = []
         self.plate_1 = Plate()
         self.plate_2 = Plate()
         self.addItem(self.plate_1)
@@ -719,26 +764,129 @@ class MainAnimationPane(QGraphicsScene):
         self.plate_2.setPos(390,100)
         self.default_speed = 2
 
+        #Electron motion, respawning and spawning run in fixed 10 ms steps of a Qt-free
+        #Simulation; the timer below only works out how many steps are due and redraws.
+        #All electrons share one array-backed store and one render item.
+        #PHOTOELEC_WORKER=1 runs the Simulation in another process instead (see worker.py)
+        #and the timer just picks up and draws what it has published
+        self.in_worker = bool(os.environ.get('PHOTOELEC_WORKER'))
+        if self.in_worker:
+            self.sim = WorkerSim(elec_density=elec_density, plate_x=self.plate_2.sceneBoundingRect().left(), rng=rng)
+            QApplication.instance().aboutToQuit.connect(self.sim.close)
+        else:
+            self.sim = Simulation(elec_density=elec_density, plate_x=self.plate_2.sceneBoundingRect().left(), rng=rng)
+        self.clock = SimClock(dt=self.sim.dt)
+        self.electrons = self.sim.electrons
+        self.elec_layer = ElectronLayer(self.electrons)
+        self.addItem(self.elec_layer)
+
         #Should be unused now that connections to intensity slider established
         #I.e. default is to have no electrons excited
         #self.init_elec(intensity, self.default_speed)
 
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.advance)
-        self.timer.timeout.connect(self.update_ke_track)
-        self.timer.start(1000/100)
-
-
-    def add_elec(self, speed, base_speed):
-        elect = Electron(speed, base_speed)
-        elect.setPos(15,100+random.random()*150)
-        self.addItem(elect)
+        #Off unless enable_profiling is called
+        self.profiler = None
 
+        #Started and stopped by MainGraph as the Animation/tracker tabs come and go
+        self.timer = QTimer()
+        self.timer.setInterval(1000/100)
+        self.timer.timeout.connect(self.tick)
+
+    def pause(self):
+        self.timer.stop()
+        if self.in_worker:
+            self.sim.set_running(False)
+
+    def resume(self):
+        if not self.timer.isActive():
+            #Time spent paused is skipped rather than caught up, so the electrons and
+            #the tracker carry on from where they stopped
+            self.clock.reset()
+            self.timer.start()
+            if self.in_worker:
+                self.sim.set_running(True)
+
+    def tick(self, steps=None):
+        #Steps the simulation by however many fixed steps are due (or exactly `steps`),
+        #then renders once - the frame rate no longer sets the speed of the electrons
+        if self.in_worker and not self.sim.alive():
+            self.leave_worker()
+        if self.in_worker:
+            #The worker has already done the stepping (in real time, whatever `steps`
+            #says), so this is just picking it up and drawing; not profiled
+            self.update_ke_track(self.collect())
+            self.elec_layer.update()
+            return
+        if steps is None:
+            steps = self.clock.advance()
+        profiler = self.profiler
+        if profiler is None:
+            for i in range(steps):
+                self.step()
+            self.update_ke_track(steps)
+            self.elec_layer.update()
+            return
+        for i in range(steps):
+            self.step()
+        start = profiler.start()
+        self.update_ke_track(steps)
+        profiler.stop('ke_track', start)
+        self.elec_layer.update()
+        profiler.end_tick(steps=steps, items=len(self.items()), electrons=self.electrons.count(), respawns=len(self.sim.respawns))
+        #A few refreshes a second is plenty for reading
+        if profiler.ticks % 25 == 0:
+            self.overlay.setText(profiler.summary_text())
+
+    def step(self):
+        energies, heights = self.sim.step()
+        if len(energies) and self.tracker is not None:
+            self.tracker.add_arrivals(energies, self.sim.time)
+
+    def collect(self):
+        #Latest worker frame, with its arrivals added a step's worth at a time as step() does
+        steps, times, energies = self.sim.sync()
+        if len(energies) and self.tracker is not None:
+            starts = np.flatnonzero(np.diff(times, prepend=np.nan))
+            for t, group in zip(times[starts].tolist(), np.split(energies, starts[1:])):
+                self.tracker.add_arrivals(group, t)
+        return steps
+
+    def leave_worker(self):
+        #The worker process has died - carry on with an in-process Simulation, with the
+        #same settings, rather than freezing
+        print(f"photoelec: simulation worker stopped (exit code {self.sim.process.exitcode}), "
+              "running the simulation in-process instead", file=sys.stderr)
+        worker = self.sim
+        worker.close()
+        self.sim = Simulation(elec_density=worker.elec_density, plate_x=worker.plate_x, rng=worker.rng)
+        #Carry on the worker's clock - the KE tracker expects arrival times to keep increasing
+        self.sim.time, self.sim.steps = worker.time, worker.steps
+        if worker.emission is not None:
+            self.sim.set_emission(*worker.emission)
+        if worker.events_path is not None:
+            self.sim.events = ArrivalWriter(worker.events_path)
+            QApplication.instance().aboutToQuit.connect(self.sim.events.close)
+        self.sim.profiler = self.profiler
+        self.electrons = self.elec_layer.electrons = self.sim.electrons
+        self.in_worker = False
+        self.clock.reset()
+
+    def enable_profiling(self, log_path=None):
+        #Times each part of the tick and shows a rolling summary in the corner of the scene
+        if self.in_worker:
+            #tick() only picks up the worker's frames, so there'd be nothing to show
+            print("photoelec: profiling isn't available with PHOTOELEC_WORKER, ignoring PHOTOELEC_PROFILE",
+                  file=sys.stderr)
+            return
+        self.profiler = TickProfiler(log_path=log_path)
+        self.sim.profiler = self.profiler
+        self.overlay = Profile_text()
+        self.overlay.setPos(25, 255)
+        self.addItem(self.overlay)
 
-    def init_elec(self, intensity, speed, base_speed, ph_scale):
+    def init_elec(self, intensity, speed, base_speed, ph_scale, wavelength=np.nan, wf=np.nan):
         if speed == 0:
-            if hasattr(self, 'sparse_timer'):
-                self.sparse_timer.stop()
+            self.sim.stop_emission()
             return None
         else:
             #Change intensity to affect total number of electrons in view at a time?
@@ -749,87 +897,54 @@ class MainAnimationPane(QGraphicsScene):
             
             #Attempt to spread initial electrons out
             #self.add_elec(speed)
-            self.sparse_timer = QTimer()
-            self.sparse_timer.timeout.connect(partial(self.sparse_add, speed, base_speed, intensity, ph_scale))
-            self.sparse_timer.start(100)
-
-    def sparse_add(self, speed, base_speed, intensity, ph_scale):
-        #50 is a better max number of electrons than 100, which is too crowded
-        #27/08: plus 10 is to account for the permanent scene items - need to keep track if this changes
-        if len(self.items()) < ph_scale*round(intensity/2)+10:
-            #small random subtraction to recreate something of a distribution of speeds
-            #To replace with actual distribution from current equation?
-            self.add_elec(speed-(random.random()/4)*speed, base_speed)
-        else:
-            return
-        
-    def update_ke_track(self):
-        wave.graph._chart6.adv()
-
+            #New electrons now come from the simulation's own spawn interval (100 ms)
+            self.sim.set_emission(intensity, speed, base_speed, ph_scale, wavelength, wf)
         
-
-
-class Electron(QGraphicsItem):
-    def __init__(self, speed, base_speed):
+    def update_ke_track(self, steps=1):
+        #Tracker time follows simulation time rather than counting timer calls
+        if self.tracker is not None:
+            self.tracker.adv(steps*self.sim.dt)
+
+def polygon_array(polygon):
+    #(n, 2) numpy view straight onto a QPolygonF's points (as pyqtgraph's
+    #ndarray_from_qpolygonf) - only valid until the polygon is next resized
+    buffer = shiboken6.VoidPtr(polygon.data(), 16*len(polygon), True)
+    return np.frombuffer(buffer, dtype=np.double).reshape(-1, 2)
+
+class ElectronLayer(QGraphicsItem):
+    #One scene item for every electron - positions/speeds live in an ElectronArray
+    #stepped by the scene's Simulation, and are drawn in a single pass
+    def __init__(self, electrons):
         super().__init__()
 
-        self.speed=speed
-        self.base_speed = base_speed
-        self.size = 5
-        self.regen = True
+        self.electrons = electrons
+        self.size = electrons.size
 
-        self.color = QColor(0,0,255) 
+        self.color = QColor(0,0,255)
+        #Round points of size+pen width look the same as the old filled ellipse with a 2px pen
+        self.pen = QPen(self.color, self.size+2)
+        self.pen.setCapStyle(Qt.RoundCap)
+        #Reused every paint and filled from numpy, so no Python objects per electron
+        self.points = QPolygonF()
 
     def boundingRect(self):
-        return QRectF(0, 0, self.size, self.size)
-    
+        #Just the gap between the plates (electrons start at x=15, y 100-250 and go
+        #at plate_2), so redrawing them each tick leaves the lamp, oscilloscope and
+        #ammeter alone
+        return QRectF(10, 95, 395, 165)
 
-    #All custom Graphics items need a paint function to describe the object to be rendered
     def paint(self, painter, option, widget):
+        x, y = self.electrons.positions()
+        if len(x) == 0:
+            return
         painter.setRenderHint(QPainter.Antialiasing)
-        
-        painter.setBrush(QBrush(QColor(0,0,255)))
-        painter.setBrush(QBrush(self.color))
-        painter.setPen(QPen(self.color, 2))
-        #print(painter.background())
-        #painter.setPen(QPen(Qt.black, 2))
-        rect = QRectF(0,0,self.size,self.size)
-        painter.drawEllipse(rect)
-        painter.setBackgroundMode(Qt.TransparentMode)
-
-    #advance is also an inherited method; triggered below whenever timer runs out (auto resets)
-    def advance(self, phase):
-        #Moves electron across according to speed, map to parent makes this a relative motion
-        self.setPos(self.mapToParent(self.speed,0))
-        if self.collidesWithItem(wave.graph._scene.plate_2):
-            wave.graph._scene.removeItem(self)
-            self.regen_elec()
-            #currently appends KE not speed, in line with voltage propotional to KE
-            wave.graph._chart6.series.append(10,self.speed**2)
-
-    def regen_elec(self):
-        if self.regen==True:
-            #20/08 original behaviour - regenerated electron had same speed
-            #speed = self.speed
-            #20/08 new behaviour - randomize speed
-            speed = self.base_speed-(random.random()/4)*self.base_speed
-            global regen_timer
-            regen_timer=QTimer()
-            #For some reason, appending timer to list works??
-            #Presumably because then the timer becomes some separate entity with something else referring to it
-            #and thus it doesn't get over written??
-            #This might get expensive with lots of timers running, however hopefully with single shots, they
-            # individually won't keep updating and getting more expensive?
-            #May need to implement some regular purge to make sure they don't build up too much.
-            wave.graph._scene.regen_list.append(regen_timer)
-            regen_timer.setSingleShot(True)
-            regen_partial= partial(wave.graph._scene.add_elec, speed, self.base_speed)
-            regen_timer.timeout.connect(regen_partial)
-            #Originally delay made sense, however switching off regen is much easier if delay is effectively zero.
-            regen_timer.start(1000/1000)
-
-    def regen_switch(self):
-        self.regen=False
+        painter.setPen(self.pen)
+        half = self.size/2
+        self.points.resize(len(x))
+        points = polygon_array(self.points)
+        np.add(x, half, out=points[:, 0])
+        np.add(y, half, out=points[:, 1])
+        painter.drawPoints(self.points)
 
 ####
 
@@ -838,6 +953,24 @@ if __name__ == '__main__':
     app=QApplication(sys.argv)
     #Create and show the form
     wave=Wave()
+    #PHOTOELEC_PROFILE=1 shows tick timings in the Animation tab, any other value
+    #is also used as the path of a rolling CSV log of them
+    profile = os.environ.get('PHOTOELEC_PROFILE')
+    if profile:
+        wave.graph._scene.enable_profiling(None if profile == '1' else profile)
+    #PHOTOELEC_ARRIVALS appends every electron arrival to that file (see arrivals.py)
+    arrivals_path = os.environ.get('PHOTOELEC_ARRIVALS')
+    if arrivals_path and wave.graph._scene.in_worker:
+        #written by the worker, which closes it on the way out
+        wave.graph._scene.sim.log_arrivals(arrivals_path)
+    elif arrivals_path:
+        wave.graph._scene.sim.events = ArrivalWriter(arrivals_path)
+        app.aboutToQuit.connect(wave.graph._scene.sim.events.close)
+    #PHOTOELEC_RECORD logs every input to that file, for replay.py
+    record_path = os.environ.get('PHOTOELEC_RECORD')
+    if record_path:
+        recorder = SessionRecorder(wave, record_path)
+        app.aboutToQuit.connect(recorder.close)
     wave.show()
     wave.resize(1000,800)
     #Run the Main QT loop
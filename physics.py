@@ -0,0 +1,140 @@
+import csv
+import os
+from functools import lru_cache
+import numpy as np
+
+#Qt-free photoemission model - everything here broadcasts over numpy arrays
+#so whole parameter grids can be evaluated in one call, the Wave slots just
+#pass in single slider values.
+
+#Exact SI values (same as scipy.constants) - importing scipy for four numbers
+#more than doubled the import time
+h=6.62607015e-34
+e=1.602176634e-19
+c=299792458.0
+k=1.380649e-23
+
+#Target metals come from materials.csv beside this file, or the CSV named by
+#PHOTOELEC_MATERIALS - columns metal, work_function (eV), optical_power
+materials_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'materials.csv')
+
+def load_materials(path=None):
+    if path is None:
+        path = os.environ.get('PHOTOELEC_MATERIALS', materials_path)
+    wfdict, powerdict = {}, {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            metal = row['metal'].strip()
+            wfdict[metal] = float(row['work_function'])
+            powerdict[metal] = float(row['optical_power'])
+    return wfdict, powerdict
+
+wfdict, powerdict = load_materials()
+
+def metal_params(metal):
+    #Work function (eV) and optical power for a metal name or array of names
+    names = np.asarray(metal)
+    wf = np.vectorize(wfdict.__getitem__, otypes=[float])(names)
+    optpower = np.vectorize(powerdict.__getitem__, otypes=[float])(names)
+    return wf, optpower
+
+def frequency_thz(wavelength):
+    #wavelength in nm
+    return c/(np.asarray(wavelength, dtype=float)*1e3)
+
+def kinetic_energy(wavelength, intensity, wf):
+    #Maximum KE of photoelectrons in eV, wavelength in nm, intensity in % of max power
+    si_wave = np.asarray(wavelength, dtype=float)*1e-9
+    intensity = np.asarray(intensity, dtype=float)
+    ke = (h*c/si_wave)-np.asarray(wf, dtype=float)*e
+    ke_elec = np.maximum(ke, 0)/e
+    #No light, no electrons
+    return np.where(intensity == 0, 0.0, ke_elec)
+
+def photocurrent(wavelength, intensity, wf, optpower):
+    si_wave = np.asarray(wavelength, dtype=float)*1e-9
+    scale = np.asarray(intensity, dtype=float)/100
+    wf = np.asarray(wf, dtype=float)
+    ke_norm=((-h*c/si_wave)+wf*e)
+    #exp overflows to inf well below threshold, which correctly gives a zero F-D factor
+    with np.errstate(over='ignore'):
+        fermi = 1/(np.exp(ke_norm/(k*300))+1)
+    #Linear (power), F-D and thermal factor
+    I = optpower*scale*si_wave/(h*c)*e*fermi*((h*c/si_wave-wf*e)/k*300)**2
+    #Crude cutoff to get inversion - essentially if F-D and thermal factors 'equal 1', switch to linear
+    return np.minimum(I, 10.93*scale*si_wave/(h*c)*e)
+
+def photoemission(wavelength, intensity, metal):
+    #KE (eV) and current arrays for any broadcastable mix of wavelengths, intensities and metal names
+    wf, optpower = metal_params(metal)
+    return kinetic_energy(wavelength, intensity, wf), photocurrent(wavelength, intensity, wf, optpower)
+
+#Every slider setting - whole nm and whole % steps
+surface_wavelengths = np.arange(100, 601)
+surface_intensities = np.arange(0, 101)
+#Bump when kinetic_energy/photocurrent change, so saved surfaces aren't reused
+surface_version = 1
+
+@lru_cache(maxsize=16)
+def response_surface(metal):
+    #KE and current for one metal over the whole wavelength x intensity slider grid,
+    #so slider and target changes are lookups. Read only, as the arrays are shared.
+    #If PHOTOELEC_SURFACES names a directory they are saved there and reused, keyed on
+    #the metal's parameters, the grid and surface_version so nothing stale is picked up.
+    wf, optpower = wfdict[metal], powerdict[metal]
+    cache_dir = os.environ.get('PHOTOELEC_SURFACES')
+    grid = f"{surface_wavelengths[0]}-{surface_wavelengths[-1]}x{surface_intensities[0]}-{surface_intensities[-1]}"
+    path = cache_dir and os.path.join(cache_dir, f"{metal}_{wf!r}_{optpower!r}_{grid}_v{surface_version}.npz")
+    if path and os.path.exists(path):
+        with np.load(path) as saved:
+            ke, current = saved['ke'], saved['current']
+    else:
+        wavelength, intensity = np.meshgrid(surface_wavelengths, surface_intensities, indexing='ij')
+        ke = kinetic_energy(wavelength, intensity, wf)
+        current = photocurrent(wavelength, intensity, wf, optpower)
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.savez(path, ke=ke, current=current)
+    ke.flags.writeable = False
+    current.flags.writeable = False
+    return ke, current
+
+def lookup(metal, wavelength, intensity):
+    #KE and current at slider values (scalars or arrays of whole nm / %)
+    ke, current = response_surface(metal)
+    w = np.asarray(wavelength, dtype=int)-surface_wavelengths[0]
+    i = np.asarray(intensity, dtype=int)-surface_intensities[0]
+    #Negative indices would quietly wrap round to the other end
+    if np.any((w < 0) | (w >= len(surface_wavelengths))):
+        raise ValueError(f"wavelength must be {surface_wavelengths[0]}-{surface_wavelengths[-1]} nm")
+    if np.any((i < 0) | (i >= len(surface_intensities))):
+        raise ValueError(f"intensity must be {surface_intensities[0]}-{surface_intensities[-1]} %")
+    return ke[w, i], current[w, i]
+
+def emission_pdf(ke, max_ke, temperature=300):
+    #Relative number of photoelectrons with kinetic energy ke (eV) - the Fermi-Dirac
+    #edge used in photocurrent, integrated over the electrons below it:
+    #kT ln(1+exp((max_ke-ke)/kT)). Linear fall to max_ke, then a thermal tail a few kT wide
+    kt = k*temperature/e
+    return kt*np.logaddexp(0, (np.asarray(max_ke, dtype=float)-np.asarray(ke, dtype=float))/kt)
+
+def photon_scale(wavelength):
+    #Scaling factor of number of photoelectrons based off constant power output
+    #For all surfaces, this linear scaling only occurs up to 200 nm after which scattering dominates
+    return np.minimum(np.asarray(wavelength, dtype=float)/200, 1)
+
+def wavelength_rgb(wavelength):
+    #Display colour of light as (red, green, blue) in 0-1, along the last axis.
+    #Values from stackoverflow 3407942, Dan Bruton - grey below 350 nm (UV)
+    w = np.asarray(wavelength, dtype=float)
+    bands = [w < 350, w < 380, w < 440, w < 490, w < 510, w < 580, w < 645, w <= 780]
+    red = np.select(bands, [0.5, (w-350)/60+0.5, (440-w)/60, 0, 0, (w-510)/70, 1, 1], 0)
+    green = np.select(bands, [0.5, (380-w)/60, 0, (w-440)/50, 1, 1, (645-w)/65, 0], 0)
+    blue = np.select(bands, [0.5, (w-350)/60+0.5, 1, 1, (510-w)/20, 0, 0, 0], 0)
+    return np.stack([red, green, blue], axis=-1)
+
+def oscillo_trace(wavelength, intensity, samples=401, span=2e-3):
+    #Oscilloscope display of the light's field - amplitude set by intensity, frequency in THz
+    x = np.linspace(-span, span, samples)
+    omega = 2*np.pi*frequency_thz(wavelength)
+    return x, (intensity/100)*np.cos(omega*x)
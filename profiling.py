@@ -0,0 +1,60 @@
+import csv
+import time
+from collections import deque
+
+#Opt-in timing of the animation hot path, one record per timer tick.
+#Sections are timed with start()/stop() pairs and summed until end_tick();
+#the last `history` records are kept and, given a log_path, rewritten there
+#every flush_every ticks as a rolling CSV log.
+class TickProfiler:
+    sections = ('advance', 'ke_track', 'respawn', 'sparse_add', 'paint')
+
+    def __init__(self, history=1000, log_path=None, flush_every=500):
+        self.records = deque(maxlen=history)
+        self.current = dict.fromkeys(self.sections, 0.0)
+        self.log_path = log_path
+        self.flush_every = flush_every
+        self.ticks = 0
+
+    def start(self):
+        return time.perf_counter()
+
+    def stop(self, section, start):
+        self.current[section] += time.perf_counter()-start
+
+    def end_tick(self, **counts):
+        record = {'time': time.time()}
+        record.update((section, value*1e3) for section, value in self.current.items())
+        record.update(counts)
+        self.records.append(record)
+        self.current = dict.fromkeys(self.sections, 0.0)
+        self.ticks += 1
+        if self.log_path and self.ticks % self.flush_every == 0:
+            self.export(self.log_path)
+
+    def summary(self, last=100):
+        #Mean ms per section over the last few ticks, plus the latest counts
+        recent = list(self.records)[-last:]
+        if not recent:
+            return {}
+        summary = {section: sum(r[section] for r in recent)/len(recent) for section in self.sections}
+        summary.update((key, value) for key, value in recent[-1].items()
+                       if key not in summary and key != 'time')
+        return summary
+
+    def summary_text(self):
+        summary = self.summary()
+        if not summary:
+            return ""
+        total = sum(summary[section] for section in self.sections)
+        times = [f"{section} {summary[section]:.2f}" for section in self.sections]
+        counts = "  ".join(f"{key} {value}" for key, value in summary.items() if key not in self.sections)
+        return f"tick {total:.2f} ms\n" + "  ".join(times[:3]) + "\n" + "  ".join(times[3:]) + f"\n{counts}"
+
+    def export(self, path):
+        if not self.records:
+            return
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.records[-1].keys()))
+            writer.writeheader()
+            writer.writerows(self.records)
@@ -0,0 +1,66 @@
+import os
+import numpy as np
+
+#One place for the app's random numbers, optionally seeded (PHOTOELEC_SEED) so a
+#run can be repeated exactly - same electrons, same 'measured' noise.
+#Values are generated a block at a time and handed out in slices, so callers
+#asking for one or two numbers per event don't pay for a generator call each time.
+#Noise and spawning draw from separate streams, so e.g. plotting more points
+#doesn't change where the electrons come out.
+
+class BlockStream:
+    def __init__(self, fill, block=4096):
+        #fill(n) returns n fresh values
+        self.fill = fill
+        self.block = block
+        self.buffer = np.zeros(0)
+        self.pos = 0
+
+    def draw(self, n):
+        if self.pos+n <= len(self.buffer):
+            #Usual case - a slice of the current block
+            values = self.buffer[self.pos:self.pos+n]
+            self.pos += n
+            return values
+        parts = []
+        while n > 0:
+            if self.pos == len(self.buffer):
+                self.buffer = self.fill(self.block)
+                self.pos = 0
+            take = min(n, len(self.buffer)-self.pos)
+            parts.append(self.buffer[self.pos:self.pos+take])
+            self.pos += take
+            n -= take
+        return np.concatenate(parts) if parts else np.zeros(0)
+
+class RandomStream:
+    #Uniform and normal draws with the same call signatures as np.random.Generator,
+    #so it can be passed anywhere a Generator is used for those
+    def __init__(self, seed=None, block=4096):
+        generator = np.random.default_rng(seed)
+        self.uniform_block = BlockStream(generator.random, block)
+        self.normal_block = BlockStream(generator.standard_normal, block)
+
+    def random(self, size=None):
+        if size is None:
+            return float(self.uniform_block.draw(1)[0])
+        return self.uniform_block.draw(int(np.prod(size))).reshape(size)
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        if size is None:
+            return loc + scale*float(self.normal_block.draw(1)[0])
+        return loc + scale*self.normal_block.draw(int(np.prod(size))).reshape(size)
+
+class RandomService:
+    def __init__(self, seed=None, block=4096):
+        self.seed = seed
+        noise_seed, spawn_seed = np.random.SeedSequence(seed).spawn(2)
+        #'Measurement' noise on the current charts
+        self.noise = RandomStream(noise_seed, block)
+        #Electron emission heights and KE draws
+        self.spawn = RandomStream(spawn_seed, block)
+
+def seed_from_env(name='PHOTOELEC_SEED'):
+    #None (fresh entropy each run) unless the variable holds an integer
+    value = os.environ.get(name)
+    return int(value) if value else None
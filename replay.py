@@ -0,0 +1,101 @@
+import argparse
+import os
+import sys
+import time
+
+#Plays a recorded session (see session.py) back into a fresh Wave, offscreen:
+#   python replay.py session.bin            as fast as possible
+#   python replay.py session.bin --speed 1  at the recorded pace (2 = twice as fast...)
+#Prints how long each input took to handle, slowest first, to find what froze.
+#Use the same PHOTOELEC_SEED as the recording to get the same electrons and noise.
+#Fast replay steps the simulation itself, so it can't be used with PHOTOELEC_WORKER.
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+from PySide6.QtWidgets import QApplication
+import main
+from session import controls, read_session
+
+def apply_event(wave, control, value):
+    if control == 'save':
+        wave.save_button.click()
+    elif control == 'press':
+        wave.slideri.sliderPressed.emit()
+    elif control == 'target':
+        wave.target.setCurrentIndex(value)
+    elif control == 'tab':
+        wave.graph.setCurrentIndex(value)
+    else:
+        getattr(wave, control).setValue(value)
+
+def replay(wave, app, events, speed=None):
+    #Returns the seconds spent handling each event (the input itself, the frame's
+    #worth of coalesced updates and any Qt events they queued)
+    scene = wave.graph._scene
+    if speed is None and scene.in_worker:
+        #The worker runs in real time whatever tick() is asked for
+        raise ValueError("fast replay can't step a PHOTOELEC_WORKER simulation - give a speed")
+    timings = np.zeros(len(events))
+    start = time.perf_counter()
+    last = 0.0
+    #Fraction of a step carried from one gap to the next
+    owed = 0.0
+    for i, (t, control, value) in enumerate(events.tolist()):
+        if speed is None:
+            #No waiting - the electrons are stepped through the recorded gap instead,
+            #if they would have been running (Animation or KE tracker tab showing).
+            #That's read from the tabs, as the timer itself is kept stopped here
+            scene.pause()
+            if wave.graph.currentWidget() in (wave.graph._tab6, wave.graph._chart6):
+                owed += (t-last)/scene.sim.dt
+                steps = int(owed)
+                owed -= steps
+                if steps > 0:
+                    scene.tick(steps)
+            last = t
+        else:
+            #Real timer and clock, just waiting until the event is due
+            while time.perf_counter()-start < t/speed:
+                app.processEvents()
+                time.sleep(0.001)
+        begin = time.perf_counter()
+        apply_event(wave, controls[control], value)
+        wave.updates.flush()
+        app.processEvents()
+        timings[i] = time.perf_counter()-begin
+    return timings
+
+def main_replay(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded photoelectric app session")
+    parser.add_argument('session', help="file recorded with PHOTOELEC_RECORD")
+    parser.add_argument('--speed', type=float, default=None,
+                        help="multiple of the recorded pace; as fast as possible if not given")
+    parser.add_argument('--slowest', type=int, default=10, help="how many of the slowest inputs to list")
+    args = parser.parse_args(argv)
+
+    if args.speed is None and os.environ.get('PHOTOELEC_WORKER'):
+        parser.error("fast replay doesn't work with PHOTOELEC_WORKER - give --speed")
+    events = read_session(args.session)
+    app = QApplication.instance() or QApplication(sys.argv)
+    wave = main.Wave()
+    wave.resize(1000, 800)
+    wave.show()
+    app.processEvents()
+
+    start = time.perf_counter()
+    timings = replay(wave, app, events, args.speed)
+    total = time.perf_counter()-start
+    recorded = events['t'][-1] if len(events) else 0.0
+    print(f"{len(events)} inputs, recorded over {recorded:.1f} s, replayed in {total:.2f} s")
+    if len(events):
+        print(f"per input: median {np.median(timings)*1e3:.2f} ms, max {timings.max()*1e3:.2f} ms")
+        print("slowest:")
+        for i in np.argsort(timings)[::-1][:args.slowest]:
+            t, control, value = events[i].tolist()
+            print(f"  #{i:<6d} at {t:8.2f} s  {controls[control]:10s} {value:5d}  {timings[i]*1e3:8.2f} ms")
+    #Skip interpreter teardown, where Qt objects can crash on the way out
+    sys.stdout.flush()
+    os._exit(0)
+
+if __name__ == '__main__':
+    main_replay()
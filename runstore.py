@@ -0,0 +1,69 @@
+import os
+import time
+import numpy as np
+import physics
+
+#Saved datasets for the KE/current charts. Every run is a block of rows (one per
+#plotted wavelength) in a single structured numpy array, so a column across all
+#runs is just records['ke'] etc. and picking runs is one mask.
+#With a path, each saved run is also appended to that file as raw records after a
+#short header naming the format version - the file is never rewritten, and reopening
+#it is a single np.fromfile. Change `magic` whenever `record` changes.
+#KE or current is nan where only the other was plotted.
+record = np.dtype([('run', 'i4'), ('name', 'U32'), ('metal', 'U64'), ('intensity', 'f8'),
+                   ('timestamp', 'f8'), ('wavelength', 'f8'), ('frequency', 'f8'),
+                   ('ke', 'f8'), ('current', 'f8')])
+magic = b'photoelec runs 2\n'
+
+class RunStore:
+    def __init__(self, path=None):
+        self.path = path
+        if path is not None and os.path.exists(path) and os.path.getsize(path):
+            with open(path, 'rb') as f:
+                head = f.read(len(magic))
+            if head != magic:
+                raise ValueError(f"{path} is not a saved runs file from this version")
+            if (os.path.getsize(path)-len(magic)) % record.itemsize:
+                raise ValueError(f"{path} ends part way through a record")
+            self.records = np.fromfile(path, dtype=record, offset=len(magic))
+        else:
+            self.records = np.zeros(0, dtype=record)
+
+    def __len__(self):
+        return len(self.runs())
+
+    def runs(self):
+        #(run id, name, metal, intensity, timestamp) for every run, oldest first
+        ids, first = np.unique(self.records['run'], return_index=True)
+        return [(int(r['run']), str(r['name']), str(r['metal']), float(r['intensity']), float(r['timestamp']))
+                for r in self.records[first]]
+
+    def add_run(self, wavelength, ke, current, metal, intensity, name=None):
+        wavelength = np.asarray(wavelength, dtype=float)
+        run = int(self.records['run'].max())+1 if len(self.records) else 0
+        name = f"Run {run+1}" if name is None else name
+        #numpy would cut longer strings short without a word
+        for field, value in (('name', name), ('metal', metal)):
+            if len(value) > record[field].itemsize//4:
+                raise ValueError(f"{field} {value!r} is longer than {record[field].itemsize//4} characters")
+        rows = np.zeros(len(wavelength), dtype=record)
+        rows['run'] = run
+        rows['name'] = name
+        rows['metal'] = metal
+        rows['intensity'] = intensity
+        rows['timestamp'] = time.time()
+        rows['wavelength'] = wavelength
+        rows['frequency'] = physics.frequency_thz(wavelength)
+        rows['ke'] = ke
+        rows['current'] = current
+        self.records = np.concatenate([self.records, rows])
+        if self.path is not None:
+            with open(self.path, 'ab') as f:
+                if f.tell() == 0:
+                    f.write(magic)
+                rows.tofile(f)
+        return run
+
+    def select(self, runs):
+        #All rows of the given run ids
+        return self.records[np.isin(self.records['run'], runs)]
@@ -0,0 +1,28 @@
+from PySide6.QtCore import QObject, QTimer
+
+#Coalesces expensive updates triggered by fast-changing inputs (slider drags).
+#Callers mark jobs dirty as often as they like; each dirty job then runs once
+#on the next frame, in priority order (lowest first).
+class FrameScheduler(QObject):
+    def __init__(self, frame_ms=16, parent=None):
+        super().__init__(parent)
+        self.jobs = {}
+        self.dirty = set()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(frame_ms)
+        self.timer.timeout.connect(self.flush)
+
+    def add_job(self, name, func, priority=0):
+        self.jobs[name] = (priority, func)
+
+    def mark(self, *names):
+        self.dirty.update(names)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        self.timer.stop()
+        dirty, self.dirty = self.dirty, set()
+        for name in sorted(dirty, key=lambda name: self.jobs[name][0]):
+            self.jobs[name][1]()
@@ -0,0 +1,209 @@
+import argparse
+import asyncio
+import struct
+import sys
+import time
+import numpy as np
+import physics
+from randomness import RandomService, seed_from_env
+from simulation import SimClock, Simulation
+
+#Headless server for running one simulation on many screens: the model and the
+#electrons are stepped once here, and every connected viewer is sent the same
+#bytes, so the cost doesn't grow with the number of displays.
+#   python server.py serve --port 8765
+#   python server.py watch --port 8765 --set wavelength 250     (stand-in viewer)
+#
+#Every message is a 5 byte header - type (1 byte) and payload length (uint32) - then
+#the payload, all little-endian:
+#  server -> viewer
+#    b'P' params, sent on connecting and whenever a setting changes:
+#         wavelength, intensity, target index (int32 x3), KE, current (float32 x2),
+#         oscilloscope samples n (uint32), then n float32 times and n float32 values
+#    b'F' frame, fps times a second:
+#         sim time (float64), steps, electrons n, arrivals m (uint32 x3),
+#         n float32 x, n float32 y, m float32 arrival KEs (for the KE tracker)
+#  viewer -> server
+#    b'S' set, control index into `settings` (uint8), value (int32)
+
+header = struct.Struct('<cI')
+params_head = struct.Struct('<iiiffI')
+frame_head = struct.Struct('<dIII')
+set_body = struct.Struct('<Bi')
+settings = ('wavelength', 'intensity', 'target')
+
+def message(kind, payload):
+    return header.pack(kind, len(payload)) + payload
+
+async def read_message(reader):
+    kind, length = header.unpack(await reader.readexactly(header.size))
+    return kind, await reader.readexactly(length)
+
+class SimServer:
+    def __init__(self, wavelength=400, intensity=50, fps=30, dt=0.01, seed=None, max_buffer=1 << 20):
+        self.metals = list(physics.wfdict)
+        self.metal = self.metals[0]
+        self.wavelength = wavelength
+        self.intensity = intensity
+        self.fps = fps
+        #A viewer that can't keep up misses frames rather than having them pile up
+        self.max_buffer = max_buffer
+        self.random = RandomService(seed)
+        self.sim = Simulation(dt=dt, rng=self.random.spawn)
+        self.clock = SimClock(dt=dt)
+        self.clients = set()
+        self.arrivals = []
+        self.frames = 0
+        self.set_emission()
+
+    def set_emission(self):
+        #Same as Wave.reset_elecs - electrons already out finish but aren't respawned
+        self.sim.regen_switch()
+        ke, current = physics.lookup(self.metal, self.wavelength, self.intensity)
+        self.ke, self.current = float(ke), float(current)
+        speed = np.sqrt(self.ke)
+        if speed == 0:
+            self.sim.stop_emission()
+        else:
+            self.sim.set_emission(self.intensity, speed, speed, float(physics.photon_scale(self.wavelength)),
+                                  self.wavelength, physics.wfdict[self.metal])
+
+    def set(self, control, value):
+        if control == 'wavelength':
+            self.wavelength = int(np.clip(value, physics.surface_wavelengths[0], physics.surface_wavelengths[-1]))
+        elif control == 'intensity':
+            self.intensity = int(np.clip(value, physics.surface_intensities[0], physics.surface_intensities[-1]))
+        elif control == 'target':
+            if not 0 <= value < len(self.metals):
+                return
+            self.metal = self.metals[value]
+            #Old metal's electrons go straight away, as in the app
+            self.sim.clear()
+        self.set_emission()
+        self.broadcast(self.params_message())
+
+    def params_message(self):
+        x, y = physics.oscillo_trace(self.wavelength, self.intensity)
+        return message(b'P', params_head.pack(self.wavelength, self.intensity, self.metals.index(self.metal),
+                                              self.ke, self.current, len(x))
+                       + x.astype('<f4').tobytes() + y.astype('<f4').tobytes())
+
+    def frame_message(self):
+        electrons = self.sim.electrons
+        alive = electrons.alive
+        energies = np.concatenate(self.arrivals) if self.arrivals else np.zeros(0)
+        self.arrivals = []
+        return message(b'F', frame_head.pack(self.sim.time, self.sim.steps, int(alive.sum()), len(energies))
+                       + electrons.x[alive].astype('<f4').tobytes() + electrons.y[alive].astype('<f4').tobytes()
+                       + energies.astype('<f4').tobytes())
+
+    def broadcast(self, data):
+        #One encoded message written to every viewer
+        for writer in list(self.clients):
+            if writer.is_closing():
+                self.clients.discard(writer)
+            elif writer.transport.get_write_buffer_size() < self.max_buffer:
+                writer.write(data)
+
+    def tick(self):
+        for i in range(self.clock.advance()):
+            energies, heights = self.sim.step()
+            if len(energies):
+                self.arrivals.append(energies)
+        self.broadcast(self.frame_message())
+        self.frames += 1
+
+    async def run(self):
+        interval = 1/self.fps
+        while True:
+            start = time.perf_counter()
+            self.tick()
+            await asyncio.sleep(max(0.0, interval-(time.perf_counter()-start)))
+
+    async def handle(self, reader, writer):
+        writer.write(self.params_message())
+        self.clients.add(writer)
+        try:
+            while True:
+                kind, payload = await read_message(reader)
+                if kind == b'S' and len(payload) == set_body.size:
+                    control, value = set_body.unpack(payload)
+                    if control < len(settings):
+                        self.set(settings[control], value)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.run())
+
+#Viewer side - a real display would draw these; watch() just checks the stream
+
+def decode_params(payload):
+    wavelength, intensity, target, ke, current, n = params_head.unpack_from(payload)
+    trace = np.frombuffer(payload, dtype='<f4', offset=params_head.size).reshape(2, n)
+    return {'wavelength': wavelength, 'intensity': intensity, 'target': target,
+            'ke': ke, 'current': current, 'oscillo': trace}
+
+def decode_frame(payload):
+    t, steps, n, m = frame_head.unpack_from(payload)
+    values = np.frombuffer(payload, dtype='<f4', offset=frame_head.size)
+    return {'time': t, 'steps': steps, 'x': values[:n], 'y': values[n:2*n], 'arrivals': values[2*n:2*n+m]}
+
+def set_message(control, value):
+    return message(b'S', set_body.pack(settings.index(control), value))
+
+async def watch(host='127.0.0.1', port=8765, frames=100, changes=()):
+    #Connects, sends any (control, value) changes and prints a summary of what came back
+    reader, writer = await asyncio.open_connection(host, port)
+    for control, value in changes:
+        writer.write(set_message(control, value))
+    await writer.drain()
+    received = bytes_in = arrivals = 0
+    params = None
+    start = time.perf_counter()
+    while received < frames:
+        kind, payload = await read_message(reader)
+        bytes_in += header.size+len(payload)
+        if kind == b'P':
+            params = decode_params(payload)
+        elif kind == b'F':
+            frame = decode_frame(payload)
+            arrivals += len(frame['arrivals'])
+            received += 1
+    elapsed = time.perf_counter()-start
+    writer.close()
+    print(f"{received} frames in {elapsed:.2f} s ({received/elapsed:.1f} fps, {bytes_in/elapsed/1e3:.1f} kB/s), "
+          f"last t={frame['time']:.2f} s with {len(frame['x'])} electrons, {arrivals} arrivals")
+    if params is not None:
+        print(f"settings: {params['wavelength']} nm, {params['intensity']}%, "
+              f"{list(physics.wfdict)[params['target']]}, KE {params['ke']:.2f} eV")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Photoelectric simulation server")
+    parser.add_argument('mode', choices=['serve', 'watch'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fps', type=int, default=30, help="frames sent a second (serve)")
+    parser.add_argument('--frames', type=int, default=100, help="frames to read before exiting (watch)")
+    parser.add_argument('--set', nargs=2, action='append', default=[], metavar=('CONTROL', 'VALUE'),
+                        help=f"change a setting on connecting (watch): one of {', '.join(settings)}")
+    args = parser.parse_args(argv)
+
+    if args.mode == 'serve':
+        #PHOTOELEC_SEED makes the served electrons repeatable, as in the app
+        server = SimServer(fps=args.fps, seed=seed_from_env())
+        try:
+            asyncio.run(server.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+    else:
+        asyncio.run(watch(args.host, args.port, args.frames,
+                          [(control, int(value)) for control, value in args.set]))
+
+if __name__ == '__main__':
+    sys.exit(main())
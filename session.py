@@ -0,0 +1,45 @@
+import time
+import numpy as np
+
+#Recording of everything the user does to the controls, so a classroom session
+#can be played back later (see replay.py) to load-test a build or reproduce a bug.
+#Each input is one fixed-size record: seconds since recording started, which
+#control (an index into `controls`) and the new value (0 for the buttons).
+event = np.dtype([('t', 'f8'), ('control', 'u1'), ('value', 'i4')])
+controls = ('slider', 'spinbox', 'slideri', 'intensity', 'target', 'save', 'press', 'tab')
+
+class SessionRecorder:
+    def __init__(self, wave, path, now=time.perf_counter):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.now = now
+        self.start = now()
+        self.recorded = 0
+        #Connected after Wave's own slots, so e.g. a slider move is logged after the
+        #spinbox it updates - replaying both is harmless, the second changes nothing
+        wave.slider.valueChanged.connect(lambda value: self.record('slider', value))
+        wave.spinbox.valueChanged.connect(lambda value: self.record('spinbox', value))
+        wave.slideri.valueChanged.connect(lambda value: self.record('slideri', value))
+        wave.intensity.valueChanged.connect(lambda value: self.record('intensity', value))
+        wave.target.currentIndexChanged.connect(lambda index: self.record('target', index))
+        wave.save_button.clicked.connect(lambda: self.record('save'))
+        wave.slideri.sliderPressed.connect(lambda: self.record('press'))
+        #Which tab is showing decides whether the electrons run, so that counts too
+        wave.graph.currentChanged.connect(lambda index: self.record('tab', index))
+
+    def record(self, control, value=0):
+        if self.file.closed:
+            return
+        row = np.array([(self.now()-self.start, controls.index(control), value)], dtype=event)
+        #Written straight through - inputs are slow, and a session that ends in a
+        #crash is exactly the one worth having
+        row.tofile(self.file)
+        self.file.flush()
+        self.recorded += 1
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+def read_session(path):
+    return np.fromfile(path, dtype=event)
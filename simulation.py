@@ -0,0 +1,196 @@
+import time
+import numpy as np
+import physics
+from electrons import ElectronArray, RespawnQueue
+
+#Fixed-timestep electron simulation, independent of Qt.
+#SimClock turns wall time into a whole number of dt steps (carrying the remainder
+#over in an accumulator) so motion keeps real-time speed when frames are dropped;
+#Simulation is stepped by that count, or as fast as possible when run headless.
+
+class SimClock:
+    def __init__(self, dt=0.01, max_steps=10, now=time.perf_counter):
+        self.dt = dt
+        #Cap on catch-up steps per call, so a long stall doesn't freeze the UI catching up
+        self.max_steps = max_steps
+        self.now = now
+        self.last = None
+        self.accumulator = 0.0
+        self.dropped = 0.0
+
+    def reset(self):
+        #Forget time elapsed while paused - the next advance starts counting afresh
+        self.last = None
+        self.accumulator = 0.0
+
+    def advance(self):
+        #Number of dt steps due since the last call
+        t = self.now()
+        if self.last is None:
+            self.last = t
+            return 0
+        self.accumulator += t - self.last
+        self.last = t
+        steps = int(self.accumulator // self.dt)
+        if steps > self.max_steps:
+            self.dropped += self.accumulator - self.max_steps*self.dt
+            steps = self.max_steps
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= steps*self.dt
+        return steps
+
+class EmissionSampler:
+    #Photoelectron KEs (eV) for a given maximum KE, drawn from physics.emission_pdf
+    #by inverse CDF on a grid. Draws come from a numpy Generator a batch at a time,
+    #and the batch is only refilled once it has all been handed out.
+    def __init__(self, max_ke, rng=None, batch=1024, grid=512, temperature=300):
+        self.max_ke = max_ke
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.batch = batch
+        #Tail is negligible beyond ~20 kT
+        kt = physics.k*temperature/physics.e
+        self.ke = np.linspace(0, max_ke+20*kt, grid)
+        pdf = physics.emission_pdf(self.ke, max_ke, temperature)
+        cdf = np.concatenate([[0], np.cumsum((pdf[1:]+pdf[:-1])/2*np.diff(self.ke))])
+        self.cdf = cdf/cdf[-1]
+        self.buffer = np.zeros(0)
+        self.pos = 0
+
+    def refill(self):
+        self.buffer = np.interp(self.rng.random(self.batch), self.cdf, self.ke)
+        self.pos = 0
+
+    def draw(self, n):
+        parts = []
+        while n > 0:
+            if self.pos == len(self.buffer):
+                self.refill()
+            take = min(n, len(self.buffer)-self.pos)
+            parts.append(self.buffer[self.pos:self.pos+take])
+            self.pos += take
+            n -= take
+        return np.concatenate(parts) if parts else np.zeros(0)
+
+class Simulation:
+    def __init__(self, dt=0.01, elec_density=1, plate_x=390, rng=None):
+        self.dt = dt
+        self.time = 0.0
+        self.steps = 0
+        #elec_density multiplies both the population cap and the spawn rate
+        self.elec_density = elec_density
+        #Scene x of the collecting plate's face
+        self.plate_x = plate_x
+        self.electrons = ElectronArray()
+        #Electrons that reach the plate respawn after respawn_delay steps
+        #Originally delay made sense, however switching off regen is much easier if delay is effectively zero.
+        self.respawns = RespawnQueue()
+        self.respawn_delay = 1
+        #New electrons are added every spawn_interval seconds while emission is on
+        self.spawn_interval = 0.1
+        self.emission = None
+        self.next_spawn = 0.0
+        #KEs are sampled for the current emission; speed is sqrt(KE) in scene units, with
+        #a floor of min_speed x the fastest so the slowest still cross in reasonable time.
+        #The floor is only for the animation - arrivals report the sampled KE.
+        #rng is anything with Generator's random() - normally RandomService().spawn
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.sampler = None
+        self.min_speed = 0.25
+        #Optional arrivals.ArrivalWriter, given every step's arrivals (even none, so
+        #it can flush on time) along with the (wavelength, intensity, wf) of the
+        #latest emission settings
+        self.events = None
+        self.run_params = (np.nan, np.nan, np.nan)
+        #Optional TickProfiler, set by whoever owns it
+        self.profiler = None
+
+    def set_emission(self, intensity, speed, base_speed, ph_scale, wavelength=np.nan, wf=np.nan):
+        self.emission = (speed, base_speed, intensity, ph_scale)
+        self.run_params = (wavelength, intensity, wf)
+        self.next_spawn = self.time + self.spawn_interval
+        if self.sampler is None or self.sampler.max_ke != speed**2:
+            self.sampler = EmissionSampler(speed**2, rng=self.rng)
+
+    def stop_emission(self):
+        self.emission = None
+        self.sampler = None
+
+    def emitted(self, n, base_speed):
+        #(speeds, KEs) for n new electrons
+        if self.sampler is None:
+            speed = np.broadcast_to(np.asarray(base_speed, dtype=float), n)
+            return speed, speed**2
+        ke = self.sampler.draw(n)
+        return np.maximum(np.sqrt(ke), self.min_speed*np.sqrt(self.sampler.max_ke)), ke
+
+    def regen_switch(self):
+        self.electrons.regen_switch()
+        self.respawns.clear()
+
+    def clear(self):
+        #Every electron gone at once, nothing waiting to respawn
+        self.electrons.clear()
+        self.respawns.clear()
+
+    def add_elecs(self, n, base_speed):
+        speed, ke = self.emitted(n, base_speed)
+        self.electrons.add_many(15, 100+self.rng.random(n)*150, speed, base_speed, ke)
+
+    def move(self):
+        #Moves every electron one step and returns the KE and height of those reaching the plate
+        self.electrons.step()
+        arrived = self.electrons.arrive(self.plate_x)
+        self.respawns.push(self.steps+self.respawn_delay, self.electrons.base_speed[arrived[self.electrons.regen[arrived]]])
+        #KE not speed, in line with voltage propotional to KE
+        energies = self.electrons.ke[arrived]
+        heights = self.electrons.y[arrived]
+        if self.events is not None:
+            self.events.write(self.time, energies, heights, *self.run_params)
+        return energies, heights
+
+    def respawn_due(self):
+        base_speed = self.respawns.pop_due(self.steps)
+        if len(base_speed):
+            #20/08 new behaviour - randomize speed (now a fresh draw from the KE distribution)
+            speed, ke = self.emitted(len(base_speed), base_speed)
+            self.electrons.add_many(15, 100+self.rng.random(len(base_speed))*150, speed, base_speed, ke)
+
+    def spawn(self):
+        if self.emission is None or self.time < self.next_spawn:
+            return
+        self.next_spawn += self.spawn_interval
+        speed, base_speed, intensity, ph_scale = self.emission
+        #50 is a better max number of electrons than 100, which is too crowded
+        room = ph_scale*round(intensity/2)*self.elec_density - self.electrons.count()
+        if room <= 0:
+            return
+        self.add_elecs(min(self.elec_density, int(np.ceil(room))), base_speed)
+
+    def step(self):
+        self.steps += 1
+        self.time += self.dt
+        profiler = self.profiler
+        if profiler is None:
+            arrivals = self.move()
+            self.respawn_due()
+            self.spawn()
+            return arrivals
+        start = profiler.start()
+        arrivals = self.move()
+        profiler.stop('advance', start)
+        start = profiler.start()
+        self.respawn_due()
+        profiler.stop('respawn', start)
+        start = profiler.start()
+        self.spawn()
+        profiler.stop('sparse_add', start)
+        return arrivals
+
+    def run(self, steps):
+        #Headless stepping as fast as the CPU allows; returns every arrival's KE and height
+        arrivals = [self.step() for i in range(steps)]
+        if not arrivals:
+            return np.zeros(0), np.zeros(0)
+        energies, heights = zip(*arrivals)
+        return np.concatenate(energies), np.concatenate(heights)
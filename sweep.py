@@ -0,0 +1,73 @@
+import argparse
+import csv
+import os
+import sys
+from multiprocessing import Pool
+import numpy as np
+import physics
+
+#Headless wavelength x intensity x metal sweeps using the same KE/current/noise
+#model as the Wave widget, without constructing any Qt objects.
+#e.g. python sweep.py --metals sodium zinc --intensities 0 100 25 -o answers.csv
+
+columns = ['metal', 'wavelength', 'frequency', 'intensity', 'ke', 'current', 'current_noise']
+
+def inclusive_range(start, stop, step):
+    return np.arange(start, stop+step/2, step)
+
+def sweep_chunk(task):
+    metal, wavelengths, intensities, noise, seed = task
+    wavelength, intensity = np.meshgrid(wavelengths, intensities, indexing='ij')
+    ke, current = physics.photoemission(wavelength, intensity, metal)
+    #Same 'measurement' noise as the current charts
+    rng = np.random.default_rng(seed)
+    current_noise = current + rng.normal(loc=0.0, scale=noise, size=current.shape)
+    return {'metal': np.full(wavelength.size, metal),
+            'wavelength': wavelength.ravel(),
+            'frequency': physics.frequency_thz(wavelength).ravel(),
+            'intensity': intensity.ravel(),
+            'ke': ke.ravel(),
+            'current': current.ravel(),
+            'current_noise': current_noise.ravel()}
+
+def run_sweep(wavelengths, intensities, metals, noise=0.01, seed=None, processes=None, chunk=64):
+    #Each task is one metal and a block of wavelengths; seeds are spawned per task
+    #so a given seed reproduces the same noise regardless of process count
+    blocks = [wavelengths[i:i+chunk] for i in range(0, len(wavelengths), chunk)]
+    tasks = [(metal, block, intensities, noise) for metal in metals for block in blocks]
+    seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+    tasks = [task+(s,) for task, s in zip(tasks, seeds)]
+    with Pool(processes) as pool:
+        parts = pool.map(sweep_chunk, tasks)
+    return {name: np.concatenate([part[name] for part in parts]) for name in columns}
+
+def write_results(results, path):
+    if path.endswith('.npz'):
+        np.savez_compressed(path, **results)
+        return
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(zip(*(results[name].tolist() for name in columns)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Photoelectric effect parameter sweep")
+    parser.add_argument('--wavelengths', nargs=3, type=float, default=[100, 600, 10],
+                        metavar=('START', 'STOP', 'STEP'), help="wavelength range in nm, inclusive")
+    parser.add_argument('--intensities', nargs=3, type=float, default=[0, 100, 10],
+                        metavar=('START', 'STOP', 'STEP'), help="intensity range in %% of max power, inclusive")
+    parser.add_argument('--metals', nargs='+', default=list(physics.wfdict.keys()),
+                        choices=list(physics.wfdict.keys()))
+    parser.add_argument('--noise', type=float, default=0.01, help="std dev of noise added to current")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--processes', type=int, default=None, help="defaults to every core")
+    parser.add_argument('-o', '--output', default='sweep.csv', help="output file, .csv or .npz")
+    args = parser.parse_args(argv)
+
+    results = run_sweep(inclusive_range(*args.wavelengths), inclusive_range(*args.intensities),
+                        args.metals, args.noise, args.seed, args.processes)
+    write_results(results, args.output)
+    print(f"Wrote {len(results['ke'])} rows to {os.path.abspath(args.output)}")
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from arrivals import ArrivalWriter
+from simulation import SimClock, Simulation
+
+#Runs the electron Simulation in its own process (PHOTOELEC_WORKER=1), so stepping
+#thousands of electrons doesn't hold up painting and slider handling.
+#The worker publishes into one block of shared memory:
+#  - electron positions, double-buffered: it fills the back buffer and then flips
+#    `front`, so the GUI always copies a finished frame. Each buffer has a sequence
+#    number that is odd while being written, and the GUI retries if it changed mid-copy.
+#  - arrivals, in a ring with a running total written - the GUI reads from where it
+#    got to last time, so none are lost between frames (unless it falls a whole ring behind).
+#Commands (emission settings, clear, run/pause) go the other way down a Pipe.
+
+class SharedState:
+    #numpy views over the shared block; the same layout in both processes
+    def __init__(self, buf, capacity, arrival_capacity):
+        self.capacity = capacity
+        self.arrival_capacity = arrival_capacity
+        offset = 0
+        def view(dtype, n):
+            nonlocal offset
+            arr = np.ndarray(n, dtype=dtype, buffer=buf, offset=offset)
+            offset += arr.nbytes
+            return arr
+        #front buffer, arrivals written in total
+        self.control = view(np.int64, 2)
+        #per buffer: seq, sim time, steps, electrons, waiting respawns
+        self.header = [view(np.float64, 5) for i in range(2)]
+        self.x = [view(np.float32, capacity) for i in range(2)]
+        self.y = [view(np.float32, capacity) for i in range(2)]
+        self.arrival_t = view(np.float64, arrival_capacity)
+        self.arrival_ke = view(np.float32, arrival_capacity)
+
+    @staticmethod
+    def size(capacity, arrival_capacity):
+        return 2*8 + 2*(5*8 + 2*4*capacity) + arrival_capacity*(8+4)
+
+    def publish(self, sim):
+        back = 1-int(self.control[0])
+        header = self.header[back]
+        x, y = sim.electrons.positions()
+        n = min(len(x), self.capacity)
+        header[0] += 1
+        self.x[back][:n] = x[:n]
+        self.y[back][:n] = y[:n]
+        header[1:] = sim.time, sim.steps, n, len(sim.respawns)
+        header[0] += 1
+        self.control[0] = back
+
+    def push_arrivals(self, t, energies):
+        m = len(energies)
+        if m == 0:
+            return
+        written = int(self.control[1])
+        idx = (written+np.arange(m)) % self.arrival_capacity
+        self.arrival_t[idx] = t
+        self.arrival_ke[idx] = energies
+        self.control[1] = written+m
+
+def run_worker(shm_name, capacity, arrival_capacity, conn, dt, elec_density, plate_x, rng):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    state = SharedState(shm.buf, capacity, arrival_capacity)
+    sim = Simulation(dt=dt, elec_density=elec_density, plate_x=plate_x, rng=rng)
+    clock = SimClock(dt=dt)
+    running = False
+    try:
+        while True:
+            #Paused, there's nothing to do until told otherwise
+            while conn.poll(0 if running else None):
+                command, args = conn.recv()
+                if command == 'stop':
+                    return
+                elif command == 'run':
+                    running = args[0]
+                    clock.reset()
+                elif command == 'events':
+                    sim.events = ArrivalWriter(*args)
+                else:
+                    getattr(sim, command)(*args)
+            start = time.perf_counter()
+            if running:
+                for i in range(clock.advance()):
+                    energies, heights = sim.step()
+                    state.push_arrivals(sim.time, energies)
+            state.publish(sim)
+            if running:
+                time.sleep(max(0.0, dt-(time.perf_counter()-start)))
+    finally:
+        if sim.events is not None:
+            sim.events.close()
+        del state
+        shm.close()
+
+class ElectronView:
+    #What the ElectronLayer needs of an ElectronArray, from the latest published frame
+    def __init__(self, size=5):
+        self.size = size
+        self.x = np.zeros(0, dtype=np.float32)
+        self.y = np.zeros(0, dtype=np.float32)
+
+    def count(self):
+        return len(self.x)
+
+    def positions(self):
+        return self.x, self.y
+
+class WorkerSim:
+    #Stands in for Simulation on the GUI side: settings are forwarded to the worker,
+    #and sync() picks up whatever it has published since the last call
+    def __init__(self, dt=0.01, elec_density=1, plate_x=390, rng=None, capacity=16384, arrival_capacity=16384):
+        self.dt = dt
+        self.elec_density = elec_density
+        self.plate_x = plate_x
+        self.rng = rng
+        #Latest settings sent, so an in-process Simulation can take over if the worker dies
+        self.emission = None
+        self.events_path = None
+        self.time = 0.0
+        self.steps = 0
+        self.n_respawns = 0
+        self.electrons = ElectronView()
+        #Arrivals handed to the GUI so far
+        self.read = 0
+        #Not used here - the worker's Simulation is profiled, if anything
+        self.profiler = None
+        self.shm = shared_memory.SharedMemory(create=True, size=SharedState.size(capacity, arrival_capacity))
+        self.state = SharedState(self.shm.buf, capacity, arrival_capacity)
+        self.state.control[:] = 0
+        for header in self.state.header:
+            header[:] = 0
+        #spawn rather than fork, so the worker doesn't inherit the GUI's Qt state
+        context = multiprocessing.get_context('spawn')
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=run_worker, daemon=True,
+                                       args=(self.shm.name, capacity, arrival_capacity, child,
+                                             dt, elec_density, plate_x, rng))
+        self.process.start()
+
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def send(self, command, *args):
+        #A dead worker just drops commands - the scene notices on its next tick
+        if not self.alive():
+            return
+        try:
+            self.conn.send((command, args))
+        except (BrokenPipeError, EOFError, OSError):
+            pass
+
+    def set_emission(self, *args):
+        self.emission = args
+        self.send('set_emission', *args)
+
+    def stop_emission(self):
+        self.emission = None
+        self.send('stop_emission')
+
+    def regen_switch(self):
+        self.send('regen_switch')
+
+    def clear(self):
+        self.send('clear')
+
+    def set_running(self, running):
+        self.send('run', running)
+
+    def log_arrivals(self, path):
+        self.events_path = path
+        self.send('events', path)
+
+    @property
+    def respawns(self):
+        #Only ever asked for its length
+        return range(self.n_respawns)
+
+    def sync(self):
+        #Copies the newest electron frame and returns (steps since last sync,
+        #arrival times, arrival KEs)
+        state = self.state
+        for attempt in range(3):
+            front = int(state.control[0])
+            header = state.header[front]
+            seq = header[0]
+            sim_time, steps, n, respawns = header[1], int(header[2]), int(header[3]), int(header[4])
+            x = state.x[front][:n].copy()
+            y = state.y[front][:n].copy()
+            if seq % 2 == 0 and header[0] == seq:
+                break
+        else:
+            #Worker kept overwriting it - keep the last frame
+            x, y = self.electrons.x, self.electrons.y
+            sim_time, steps, respawns = self.time, self.steps, self.n_respawns
+        self.electrons.x, self.electrons.y = x, y
+        new_steps = max(steps-self.steps, 0)
+        self.time, self.steps, self.n_respawns = sim_time, steps, respawns
+        written = int(state.control[1])
+        start = max(self.read, written-state.arrival_capacity)
+        idx = np.arange(start, written) % state.arrival_capacity
+        self.read = written
+        return new_steps, state.arrival_t[idx], state.arrival_ke[idx].astype(float)
+
+    def close(self):
+        if self.process is None:
+            return
+        self.send('stop')
+        self.conn.close()
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
+        del self.state
+        self.shm.close()
+        self.shm.unlink()